@@ -0,0 +1,33 @@
+"""Sweep API: start ASHA sweeps and inspect their trials and decisions."""
+
+from fastapi import APIRouter, HTTPException
+
+from app.core.responses import CodecJSONResponse
+from app.services.sweep_service import create_sweep, get_sweep, list_sweeps
+from shared.schemas.sweep import SweepCreateRequest
+
+router = APIRouter(prefix="/sweeps", tags=["sweeps"], default_response_class=CodecJSONResponse)
+
+
+@router.post("", status_code=201)
+async def create(request: SweepCreateRequest) -> CodecJSONResponse:
+    """Start a sweep; the controller launches trials and stops losing ones early."""
+    try:
+        return CodecJSONResponse(await create_sweep(request), status_code=201)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("")
+async def list_all(limit: int = 50) -> CodecJSONResponse:
+    """List sweeps with their compute accounting."""
+    return CodecJSONResponse(await list_sweeps(limit))
+
+
+@router.get("/{sweep_id}")
+async def get(sweep_id: str) -> CodecJSONResponse:
+    """Sweep summary, trials and every early-stopping decision."""
+    sweep = await get_sweep(sweep_id)
+    if sweep is None:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    return CodecJSONResponse(sweep)
@@ -0,0 +1,191 @@
+"""In-process response cache for hot read endpoints."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from app.core.config import get_settings
+
+LIST_TAG = "jobs:list"
+# Job event source for new metric points (see metrics_collector)
+METRICS_SOURCE = "metrics"
+
+
+def job_tag(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def metrics_tag(job_id: str) -> str:
+    return f"job_metrics:{job_id}"
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache with a per-entry TTL and tag-based invalidation.
+
+    Concurrent misses for the same key share one computation, and a result
+    whose tags were invalidated while it was being computed is returned to
+    its callers but not stored.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled and maxsize > 0 and ttl > 0
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[Hashable]] = {}
+        self._inflight: dict[Hashable, tuple[asyncio.Future, tuple[str, ...]]] = {}
+        self._stale_inflight: set[Hashable] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = ()) -> None:
+        if not self.enabled:
+            return
+        tags = tuple(tags)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (self._clock() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        tags: Iterable[str],
+        compute: Callable[[], Awaitable[Any]],
+        store: bool = True,
+    ) -> Any:
+        """
+        Return the cached value for key, computing (once) and storing it on a miss.
+        With store=False concurrent misses still share one computation, but the
+        result is not kept.
+        """
+        if not self.enabled:
+            return await compute()
+
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight[0])
+            except asyncio.CancelledError:
+                # The request computing the value went away; compute it ourselves
+                if not inflight[0].cancelled():
+                    raise
+                return await compute()
+
+        tags = tuple(tags)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (future, tags)
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve so an exception with no other waiters is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if store and key not in self._stale_inflight:
+                self.set(key, value, tags)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            self._stale_inflight.discard(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry carrying tag. Returns the number of entries removed."""
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._remove(key)
+        for key, (_, tags) in self._inflight.items():
+            if tag in tags:
+                self._stale_inflight.add(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def invalidate_job(self, job_id: str, source: str | None = None) -> int:
+        """
+        A job changed. New metric points only make its metric series stale;
+        anything else (status, DB sync, submit) drops all of its entries and every job list.
+        """
+        removed = self.invalidate_tag(metrics_tag(job_id))
+        if source == METRICS_SOURCE:
+            return removed
+        return removed + self.invalidate_tag(job_tag(job_id)) + self.invalidate_tag(LIST_TAG)
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+        self._stale_inflight.update(self._inflight)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+_settings = get_settings()
+response_cache = ResponseCache(
+    maxsize=_settings.response_cache_size,
+    ttl=_settings.response_cache_ttl_s,
+    enabled=_settings.response_cache_enabled,
+)
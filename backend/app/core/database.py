@@ -1,6 +1,17 @@
-"""SQLAlchemy async database setup."""
+"""SQLAlchemy async database setup.
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+Three engines share one configuration:
+- engine: API requests against the primary.
+- ingest_engine: background writers (metrics collector, status sync), with their own pool.
+- replica_engine: read-only list/metrics queries. It is the primary engine
+  unless DATABASE_REPLICA_URL is set.
+"""
+
+from typing import Any
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
 from app.core.config import get_settings
@@ -10,22 +21,94 @@ class Base(DeclarativeBase):
     pass
 
 
-def get_engine():
+def get_engine(url: str | None = None, pool_size: int | None = None, max_overflow: int | None = None):
     settings = get_settings()
-    return create_async_engine(
-        settings.database_url,
-        echo=False,
+    url = url or settings.database_url
+    kwargs: dict[str, Any] = {"echo": False}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # aiosqlite gets NullPool/StaticPool, which take no pool arguments
+        return create_async_engine(url, **kwargs)
+
+    kwargs.update(
+        pool_size=settings.db_pool_size if pool_size is None else pool_size,
+        max_overflow=settings.db_max_overflow if max_overflow is None else max_overflow,
+        pool_timeout=settings.db_pool_timeout_s,
+        pool_recycle=settings.db_pool_recycle_s,
+        pool_pre_ping=settings.db_pool_pre_ping,
     )
+    if parsed.get_driver_name() == "asyncpg":
+        # Both asyncpg's own cache and SQLAlchemy's adapter cache must be off behind PgBouncer
+        kwargs["connect_args"] = {
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+        }
+    return create_async_engine(url, **kwargs)
 
 
+def _session_maker(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+_settings = get_settings()
 engine = get_engine()
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
+ingest_engine = get_engine(
+    pool_size=_settings.db_ingest_pool_size, max_overflow=_settings.db_ingest_max_overflow
 )
+replica_engine = get_engine(_settings.database_replica_url) if _settings.database_replica_url else engine
+has_replica = replica_engine is not engine
+
+async_session_maker = _session_maker(engine)
+ingest_session_maker = _session_maker(ingest_engine)
+replica_session_maker = _session_maker(replica_engine)
+
+ENGINES: dict[str, AsyncEngine] = {"api": engine, "ingest": ingest_engine}
+if has_replica:
+    ENGINES["replica"] = replica_engine
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    """Live pool state per engine (NullPool/StaticPool report only their class)."""
+    stats = {}
+    for name, eng in ENGINES.items():
+        pool = eng.sync_engine.pool
+        entry: dict[str, Any] = {"pool": type(pool).__name__}
+        for attr in ("size", "checkedout", "checkedin", "overflow"):
+            reader = getattr(pool, attr, None)
+            if reader is not None:
+                entry[attr] = reader()
+        stats[name] = entry
+    return stats
+
+
+def add_missing_columns(conn: Connection) -> list[str]:
+    """
+    Startup migration for tables that predate a column: create_all() skips
+    existing tables, so add any nullable model column (and its index) the
+    database lacks. Idempotent; returns the "table.column" names it added.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    return added
 
 
 async def get_db() -> AsyncSession:
@@ -38,3 +121,16 @@ async def get_db() -> AsyncSession:
             raise
         finally:
             await session.close()
+
+
+async def get_read_db() -> AsyncSession:
+    """
+    Session for read-only queries that tolerate replica lag (job lists, metric series).
+    Don't cache their results while has_replica: invalidations follow primary writes, so a
+    lagging replica would put the stale rows back for the whole TTL.
+    """
+    async with replica_session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
@@ -0,0 +1,167 @@
+"""
+Prometheus metrics for the backend, served at /metrics.
+
+Hot paths only touch pre-bound metric children (a lock and an add per
+observation). Anything that needs I/O, such as queue lengths, jobs by
+status, the Redis round-trip and pool state, is read when Prometheus
+scrapes. Values are per process, like /cache/stats, so scrape every worker.
+"""
+
+import logging
+import time
+from typing import Any
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import func, select
+
+from app.core.database import async_session_maker
+from app.core.redis_client import redis_client
+from app.models.job import JobModel
+
+logger = logging.getLogger(__name__)
+
+disable_created_metrics()  # *_created series double the output and nobody queries them
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+CELERY_QUEUES = ("celery",)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ml_train_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+INGEST_MESSAGES = Counter(
+    "ml_train_ingest_messages_total",
+    "Metric messages handled by the collector",
+    ["result"],
+)
+INGEST_POINTS = Counter("ml_train_ingest_points_total", "Metric values written to the DB")
+INGEST_LAG_SECONDS = Histogram(
+    "ml_train_ingest_lag_seconds",
+    "Trainer publish timestamp to DB commit",
+    buckets=LAG_BUCKETS,
+)
+DB_WRITE_SECONDS = Histogram(
+    "ml_train_db_write_duration_seconds",
+    "DB write latency of background writers",
+    ["writer"],
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_LENGTH = Gauge("ml_train_queue_length", "Redis list lengths (Celery queues, status sync backlog)", ["queue"])
+JOBS_BY_STATUS = Gauge("ml_train_jobs", "Jobs in the DB by status", ["status"])
+REDIS_ROUNDTRIP_SECONDS = Gauge("ml_train_redis_roundtrip_seconds", "Redis PING round-trip at scrape time")
+SCRAPE_ERRORS = Counter("ml_train_scrape_errors_total", "Failures reading scrape-time metrics", ["source"])
+_seen_statuses: set[str] = set()
+
+# Pre-bound children for the collector's per-message path
+INGEST_STORED = INGEST_MESSAGES.labels("stored")
+INGEST_INVALID = INGEST_MESSAGES.labels("invalid")
+INGEST_FAILED = INGEST_MESSAGES.labels("error")
+COLLECTOR_WRITE_SECONDS = DB_WRITE_SECONDS.labels("metrics_collector")
+
+
+class PoolCollector:
+    """DB connection pool state per engine, read from SQLAlchemy at scrape time."""
+
+    def __init__(self) -> None:
+        self.engines: dict[str, Any] = {}
+
+    def register(self, name: str, engine) -> None:
+        self.engines[name] = engine
+
+    def collect(self):
+        families = {
+            "size": GaugeMetricFamily("ml_train_db_pool_size", "Configured pool size", labels=["pool"]),
+            "checkedout": GaugeMetricFamily("ml_train_db_pool_checked_out", "Connections in use", labels=["pool"]),
+            "checkedin": GaugeMetricFamily("ml_train_db_pool_checked_in", "Idle pooled connections", labels=["pool"]),
+            "overflow": GaugeMetricFamily("ml_train_db_pool_overflow", "Connections beyond pool_size", labels=["pool"]),
+        }
+        for name, engine in self.engines.items():
+            pool = engine.sync_engine.pool
+            for attr, family in families.items():
+                # NullPool/StaticPool (e.g. SQLite) have no counters
+                reader = getattr(pool, attr, None)
+                if reader is not None:
+                    family.add_metric([name], reader())
+        yield from families.values()
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template
+    (not per raw path, so job ids don't create new series).
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+async def _refresh_redis() -> None:
+    client = redis_client.client
+    start = time.perf_counter()
+    await client.ping()
+    REDIS_ROUNDTRIP_SECONDS.set(time.perf_counter() - start)
+    pipe = client.pipeline(transaction=False)
+    for queue in CELERY_QUEUES:
+        pipe.llen(queue)
+    pipe.llen(redis_client.STATUS_UPDATES_KEY)
+    lengths = await pipe.execute()
+    for queue, length in zip((*CELERY_QUEUES, "status_updates"), lengths):
+        QUEUE_LENGTH.labels(queue).set(length)
+
+
+async def _refresh_jobs() -> None:
+    async with async_session_maker() as session:
+        rows = await session.execute(select(JobModel.status, func.count()).group_by(JobModel.status))
+    counts = dict(rows.all())
+    # Statuses that emptied out drop to 0 instead of keeping their last value
+    _seen_statuses.update(counts)
+    for status in _seen_statuses:
+        JOBS_BY_STATUS.labels(status).set(counts.get(status, 0))
+
+
+async def render_metrics() -> tuple[bytes, str]:
+    """Refresh scrape-time gauges, then the exposition text and its content type."""
+    for source, refresh in (("redis", _refresh_redis), ("db", _refresh_jobs)):
+        try:
+            await refresh()
+        except Exception as e:
+            SCRAPE_ERRORS.labels(source).inc()
+            logger.warning("Metrics scrape of %s failed: %s", source, e)
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,11 +1,11 @@
 """Redis client for job queue and metrics pub/sub."""
 
-import json
 from typing import Any
 
 import redis.asyncio as redis
 
 from app.core.config import get_settings
+from shared import codec
 
 
 class RedisClient:
@@ -15,17 +15,18 @@ class RedisClient:
     JOB_PREFIX = "ml_train:job:"
     METRICS_CHANNEL = "ml_train:metrics"
     JOB_STATUS_PREFIX = "ml_train:job_status:"
+    STATUS_UPDATES_KEY = "ml_train:job_status_updates"
+    JOB_EVENTS_CHANNEL = "ml_train:job_events"
 
     def __init__(self) -> None:
         self._client: redis.Redis | None = None
+        self._metrics_encoding = "json"
 
     async def connect(self) -> None:
         settings = get_settings()
-        self._client = redis.from_url(
-            settings.redis_url,
-            encoding="utf-8",
-            decode_responses=True,
-        )
+        self._metrics_encoding = settings.metrics_encoding
+        # Raw bytes: payloads are decoded by the codec, which may see binary messages
+        self._client = redis.from_url(settings.redis_url, decode_responses=False)
 
     async def disconnect(self) -> None:
         if self._client:
@@ -40,37 +41,69 @@ class RedisClient:
 
     async def enqueue_job(self, job_id: str, payload: dict[str, Any]) -> None:
         """Add job to the queue."""
-        await self.client.lpush(self.QUEUE_KEY, json.dumps({"job_id": job_id, **payload}))
+        await self.client.lpush(self.QUEUE_KEY, codec.dumps({"job_id": job_id, **payload}))
 
     async def get_job_data(self, job_id: str) -> dict | None:
         """Get stored job data."""
         data = await self.client.get(f"{self.JOB_PREFIX}{job_id}")
-        return json.loads(data) if data else None
+        return codec.loads(data) if data else None
 
     async def set_job_data(self, job_id: str, data: dict[str, Any], ttl: int = 86400) -> None:
         """Store job data with TTL (default 24h)."""
         await self.client.setex(
             f"{self.JOB_PREFIX}{job_id}",
             ttl,
-            json.dumps(data),
+            codec.dumps(data),
         )
 
+    async def queue_jobs(self, jobs: dict[str, dict[str, Any]], ttl: int = 86400) -> None:
+        """Store data and queued status for many jobs in one pipelined round-trip."""
+        pipe = self.client.pipeline(transaction=False)
+        for job_id, data in jobs.items():
+            pipe.setex(f"{self.JOB_PREFIX}{job_id}", ttl, codec.dumps(data))
+            pipe.setex(
+                f"{self.JOB_STATUS_PREFIX}{job_id}",
+                86400,
+                codec.dumps({"status": data.get("status", "queued")}),
+            )
+        await pipe.execute()
+
     async def set_job_status(self, job_id: str, status: str, extra: dict | None = None) -> None:
         """Update job status in Redis."""
         key = f"{self.JOB_STATUS_PREFIX}{job_id}"
         data = {"status": status, **(extra or {})}
-        await self.client.setex(key, 86400, json.dumps(data))
+        await self.client.setex(key, 86400, codec.dumps(data))
 
     async def get_job_status(self, job_id: str) -> dict | None:
         """Get job status from Redis."""
         data = await self.client.get(f"{self.JOB_STATUS_PREFIX}{job_id}")
-        return json.loads(data) if data else None
+        return codec.loads(data) if data else None
+
+    async def get_job_snapshot(self, job_id: str) -> tuple[dict | None, dict | None]:
+        """Get (job data, job status) in a single MGET round-trip."""
+        data, status = await self.client.mget(
+            f"{self.JOB_PREFIX}{job_id}",
+            f"{self.JOB_STATUS_PREFIX}{job_id}",
+        )
+        return (
+            codec.loads(data) if data else None,
+            codec.loads(status) if status else None,
+        )
+
+    async def publish_job_events(self, job_ids: list[str], source: str) -> None:
+        """Tell every backend process that these jobs changed (cache invalidation)."""
+        if not job_ids:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.publish(self.JOB_EVENTS_CHANNEL, codec.dumps({"job_id": job_id, "source": source}))
+        await pipe.execute()
 
     async def publish_metrics(self, job_id: str, metrics: dict[str, Any]) -> None:
         """Publish metrics to channel for collector."""
         await self.client.publish(
             self.METRICS_CHANNEL,
-            json.dumps({"job_id": job_id, **metrics}),
+            codec.encode_message({"job_id": job_id, **metrics}, self._metrics_encoding),
         )
 
 
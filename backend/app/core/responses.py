@@ -0,0 +1,18 @@
+"""Pre-serialized JSON responses that bypass FastAPI's jsonable_encoder."""
+
+from typing import Any
+
+from fastapi.responses import Response
+
+from shared import codec
+
+
+class CodecJSONResponse(Response):
+    """JSON response rendered by the shared codec. Accepts already-encoded bytes."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return codec.dumps(content)
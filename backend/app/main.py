@@ -3,38 +3,56 @@
 import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.jobs import router as jobs_router
+from app.api.sweeps import router as sweeps_router
+from app.core.cache import response_cache
 from app.core.config import get_settings
-from app.core.database import engine, Base
+from app.core.database import ENGINES, engine, Base, add_missing_columns, pool_stats
+from app.core.observability import MetricsMiddleware, pool_collector, render_metrics
 from app.core.redis_client import redis_client
+from app.services import memoization
 
 
-_metrics_task = None
+_background_tasks: list[asyncio.Task] = []
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Startup: connect Redis, create tables, start metrics collector. Shutdown: disconnect."""
-    global _metrics_task
+    """Startup: connect Redis, create tables, start background services. Shutdown: disconnect, close DB pools."""
     await redis_client.connect()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
 
+    from app.services.cache_invalidator import start_cache_invalidator_background
     from app.services.metrics_collector import start_metrics_collector_background
-    _metrics_task = start_metrics_collector_background()
+    from app.services.status_sync import start_status_sync_background
+    _background_tasks.append(start_metrics_collector_background())
+    _background_tasks.append(start_status_sync_background())
+    _background_tasks.append(start_cache_invalidator_background())
+    if settings.sweep_controller_enabled:
+        from app.services.sweep_controller import start_sweep_controller_background
+        _background_tasks.append(start_sweep_controller_background())
 
     yield
 
-    if _metrics_task:
-        _metrics_task.cancel()
+    for task in _background_tasks:
+        task.cancel()
         try:
-            await _metrics_task
+            await task
         except asyncio.CancelledError:
             pass
+    _background_tasks.clear()
+
+    from app.services.job_service import shutdown_enqueue_executor
+    shutdown_enqueue_executor()
     await redis_client.disconnect()
+    # Close pooled connections of every engine (api, ingest, replica)
+    for pool_engine in ENGINES.values():
+        await pool_engine.dispose()
 
 
 app = FastAPI(
@@ -53,9 +71,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+for name, pool_engine in ENGINES.items():
+    pool_collector.register(name, pool_engine)
+
 app.include_router(jobs_router, prefix=settings.api_prefix)
+app.include_router(sweeps_router, prefix=settings.api_prefix)
 
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition for this process."""
+    body, content_type = await render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
+
+@app.get("/memo/stats")
+async def memo_stats():
+    """Result memoization counters across all backend processes."""
+    return await memoization.stats()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Response cache counters for this process (for sizing the cache)."""
+    return {"response_cache": response_cache.stats()}
+
+
+@app.get("/db/stats")
+async def db_stats():
+    """Live connection pool state per engine (api, ingest, replica) for this process."""
+    return pool_stats()
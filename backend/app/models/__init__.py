@@ -1,5 +1,6 @@
 """Database models."""
 
 from app.models.job import JobModel, MetricModel
+from app.models.sweep import SweepDecisionModel, SweepModel, SweepTrialModel
 
-__all__ = ["JobModel", "MetricModel"]
+__all__ = ["JobModel", "MetricModel", "SweepDecisionModel", "SweepModel", "SweepTrialModel"]
@@ -0,0 +1,71 @@
+"""Sweep, trial and early-stopping decision models."""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Float, ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.core.database import Base
+
+
+class SweepModel(Base):
+    """A hyperparameter sweep driven by the sweep controller."""
+
+    __tablename__ = "sweeps"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    status: Mapped[str] = mapped_column(String(32), default="running", index=True)
+    config: Mapped[dict] = mapped_column(JSON, default=dict)  # SweepCreateRequest
+    best_job_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    best_value: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # Compute accounting in trial-epochs: budget = trials * max_epochs
+    epochs_budget: Mapped[float] = mapped_column(Float, default=0.0)
+    epochs_used: Mapped[float] = mapped_column(Float, default=0.0)
+    epochs_saved: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    trials: Mapped[list["SweepTrialModel"]] = relationship(
+        back_populates="sweep", cascade="all, delete-orphan", order_by="SweepTrialModel.index"
+    )
+    decisions: Mapped[list["SweepDecisionModel"]] = relationship(
+        back_populates="sweep", cascade="all, delete-orphan", order_by="SweepDecisionModel.id"
+    )
+
+
+class SweepTrialModel(Base):
+    """One grid point of a sweep and the job running it (once launched)."""
+
+    __tablename__ = "sweep_trials"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    sweep_id: Mapped[str] = mapped_column(String(36), ForeignKey("sweeps.id"), index=True)
+    index: Mapped[int] = mapped_column(Integer)
+    config: Mapped[dict] = mapped_column(JSON, default=dict)  # JobSubmitRequest
+    # waiting -> launched -> succeeded | failed | cancelled | stopped (early-stopped by ASHA)
+    status: Mapped[str] = mapped_column(String(32), default="waiting")
+    job_id: Mapped[str | None] = mapped_column(String(36), nullable=True, index=True)
+    owned: Mapped[bool] = mapped_column(default=True)  # False if memoization attached it to another job
+    epochs_completed: Mapped[int] = mapped_column(Integer, default=0)
+    last_value: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    sweep: Mapped["SweepModel"] = relationship(back_populates="trials")
+
+
+class SweepDecisionModel(Base):
+    """ASHA decision for a trial reaching a rung."""
+
+    __tablename__ = "sweep_decisions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    sweep_id: Mapped[str] = mapped_column(String(36), ForeignKey("sweeps.id"), index=True)
+    job_id: Mapped[str] = mapped_column(String(36))
+    rung: Mapped[int] = mapped_column(Integer)  # epochs completed
+    value: Mapped[float] = mapped_column(Float)
+    cutoff: Mapped[float | None] = mapped_column(Float, nullable=True)
+    decision: Mapped[str] = mapped_column(String(16))  # "continue" or "stop"
+    epochs_saved: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    sweep: Mapped["SweepModel"] = relationship(back_populates="decisions")
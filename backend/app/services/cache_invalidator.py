@@ -0,0 +1,56 @@
+"""Background service: invalidate this process's response cache on job events."""
+
+import asyncio
+import logging
+
+import redis.asyncio as redis
+
+from app.core.cache import response_cache
+from app.core.config import get_settings
+from app.core.redis_client import RedisClient
+from shared import codec
+
+logger = logging.getLogger(__name__)
+JOB_EVENTS_CHANNEL = RedisClient.JOB_EVENTS_CHANNEL
+
+
+async def run_cache_invalidator():
+    """Subscribe to job events and drop cached responses for the changed jobs."""
+    settings = get_settings()
+    client = redis.from_url(settings.redis_url, decode_responses=False)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(JOB_EVENTS_CHANNEL)
+    # Events published while we were not subscribed are lost; start clean
+    response_cache.clear()
+    logger.info(f"Subscribed to {JOB_EVENTS_CHANNEL}")
+
+    try:
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                event = codec.loads(message["data"])
+                job_id = event.get("job_id")
+                if job_id:
+                    response_cache.invalidate_job(job_id, event.get("source"))
+            except Exception as e:
+                logger.exception("Cache invalidation error: %s", e)
+    finally:
+        await pubsub.unsubscribe(JOB_EVENTS_CHANNEL)
+        await client.close()
+
+
+def start_cache_invalidator_background():
+    """Start the invalidator in a background task."""
+    async def _run():
+        while True:
+            try:
+                await run_cache_invalidator()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception("Cache invalidator crashed: %s", e)
+                response_cache.clear()
+                await asyncio.sleep(5)
+
+    return asyncio.create_task(_run())
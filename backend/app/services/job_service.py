@@ -1,15 +1,24 @@
 """Job submission and queue service."""
 
+import asyncio
+import copy
+import itertools
+import math
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from celery import Celery
+from pydantic import ValidationError
+from sqlalchemy import update
 
+from app.core.cache import LIST_TAG, response_cache
 from app.core.config import get_settings
 from app.core.database import async_session_maker
 from app.core.redis_client import redis_client
 from app.models.job import JobModel
-from shared.schemas.job import JobStatus, JobSubmitRequest
+from app.services import memoization
+from shared.schemas.job import JobBatchSubmitRequest, JobStatus, JobSubmitRequest
 
 settings = get_settings()
 celery_app = Celery(
@@ -17,48 +26,346 @@ celery_app = Celery(
     broker=settings.redis_url,
     backend=settings.redis_url,
 )
+# One pooled broker connection per enqueue thread
+celery_app.conf.broker_pool_limit = settings.enqueue_workers
 
+# send_task does blocking broker I/O; run it off the event loop on a bounded pool.
+# Created on first use so the app can start again after shutdown_enqueue_executor().
+_enqueue_executor: ThreadPoolExecutor | None = None
 
-async def submit_job(request: JobSubmitRequest) -> tuple[str, dict[str, Any]]:
-    """
-    Submit a training job to the queue.
-    Returns (job_id, response_data).
-    """
-    job_id = str(uuid.uuid4())
-    payload = {
+# Must match the name registered in orchestrator/app/tasks.py. Results are
+# never read by the backend, so tasks are sent with ignore_result=True.
+PROCESS_JOB_TASK = "orchestrator.tasks.process_training_job"
+CANCEL_JOB_TASK = "orchestrator.tasks.cancel_training_job"
+TERMINAL_STATUSES = {JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value}
+
+
+def _build_payload(request: JobSubmitRequest) -> dict[str, Any]:
+    return {
         "name": request.name,
         "model_config": request.architecture_config.model_dump(),
         "training_config": request.training_config.model_dump(),
+        "priority": request.priority,
+        "owner": request.owner,
+        "seed": request.seed,
+        "code_version": request.code_version or settings.trainer_code_version,
+        "config_hash": memoization.config_hash(request, settings.trainer_code_version),
     }
 
-    # Store job metadata in Redis
-    await redis_client.set_job_data(job_id, {
+
+def _memoize(request: JobSubmitRequest) -> bool:
+    # Without a known code version, identical configs may still train different code
+    code_version = request.code_version or settings.trainer_code_version
+    return settings.memo_enabled and request.reuse_results and bool(code_version)
+
+
+def _reused_response(reused: dict[str, Any]) -> dict[str, Any]:
+    message = (
+        "Identical job already succeeded; returning its results"
+        if reused["memoized"] == "hit"
+        else "Identical job is already queued or running; attached to it"
+    )
+    return {**reused, "message": message}
+
+
+def _job_data(request: JobSubmitRequest, payload: dict[str, Any]) -> dict[str, Any]:
+    return {
         "status": JobStatus.QUEUED.value,
         "config": payload,
         "name": request.name,
-    })
-    await redis_client.set_job_status(job_id, JobStatus.QUEUED.value)
+    }
 
-    # Persist to PostgreSQL for list_jobs
-    async with async_session_maker() as session:
-        job = JobModel(
-            id=job_id,
-            name=request.name,
-            status=JobStatus.QUEUED.value,
-            config=payload,
-        )
-        session.add(job)
-        await session.commit()
 
-    # Enqueue to Celery (orchestrator will pick up)
+def _send_job(job_id: str, payload: dict[str, Any]) -> None:
     celery_app.send_task(
-        "orchestrator.app.tasks.process_training_job",
+        PROCESS_JOB_TASK,
         args=[job_id],
         kwargs={"payload": payload},
+        ignore_result=True,
     )
 
+
+def _get_enqueue_executor() -> ThreadPoolExecutor:
+    global _enqueue_executor
+    if _enqueue_executor is None:
+        _enqueue_executor = ThreadPoolExecutor(
+            max_workers=settings.enqueue_workers,
+            thread_name_prefix="celery-enqueue",
+        )
+    return _enqueue_executor
+
+
+async def _run_in_enqueue_executor(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_enqueue_executor(), fn, *args)
+
+
+def shutdown_enqueue_executor() -> None:
+    """Wait for in-flight publishes to finish. Called on app shutdown; the next use starts a new pool."""
+    global _enqueue_executor
+    executor, _enqueue_executor = _enqueue_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+async def submit_job(request: JobSubmitRequest) -> tuple[str, dict[str, Any]]:
+    """
+    Submit a training job to the queue.
+    Returns (job_id, response_data).
+    """
+    job_id = str(uuid.uuid4())
+    payload = _build_payload(request)
+
+    if _memoize(request):
+        reused = (await memoization.resolve({job_id: payload["config_hash"]})).get(job_id)
+        if reused:
+            await memoization.record({reused["memoized"]: 1})
+            return reused["job_id"], _reused_response(reused)
+
+    # Don't let later identical submissions attach to a job that never runs
+    claims = {job_id: payload["config_hash"]} if _memoize(request) else {}
+    try:
+        # Store job metadata and status in Redis
+        await redis_client.queue_jobs({job_id: _job_data(request, payload)})
+
+        # Persist to PostgreSQL for list_jobs
+        async with async_session_maker() as session:
+            job = JobModel(
+                id=job_id,
+                name=request.name,
+                status=JobStatus.QUEUED.value,
+                config=payload,
+                config_hash=payload["config_hash"],
+            )
+            session.add(job)
+            await session.commit()
+    except BaseException:
+        await memoization.release(claims)
+        raise
+
+    # Enqueue to Celery (orchestrator will pick up)
+    try:
+        await _run_in_enqueue_executor(_send_job, job_id, payload)
+    except Exception as e:
+        await _mark_failed({job_id: str(e)})
+        await memoization.release(claims)
+        raise
+    except BaseException:
+        await memoization.release(claims)
+        raise
+    await _invalidate_job_lists([job_id])
+    if _memoize(request):
+        await memoization.confirm([payload["config_hash"]])
+        await memoization.record({"miss": 1})
+    else:
+        await memoization.record({"bypassed": 1})
+
     return job_id, {
         "job_id": job_id,
         "status": JobStatus.QUEUED.value,
         "message": "Job queued successfully",
     }
+
+
+def _send_cancel(job_id: str) -> None:
+    celery_app.send_task(CANCEL_JOB_TASK, args=[job_id], ignore_result=True)
+
+
+async def cancel_job(job_id: str) -> dict[str, Any] | None:
+    """
+    Ask the orchestrator to cancel a job (withdraw it from admission or stop
+    its K8s Job / local run); it marks the job cancelled. Returns None if the
+    job does not exist.
+    """
+    status = await redis_client.get_job_status(job_id)
+    current = status.get("status") if status else None
+    if current is None:
+        async with async_session_maker() as session:
+            job = await session.get(JobModel, job_id)
+            if job is None:
+                return None
+            current = job.status
+    if current in TERMINAL_STATUSES:
+        return {"job_id": job_id, "status": current, "message": "Job already finished"}
+    await _run_in_enqueue_executor(_send_cancel, job_id)
+    return {"job_id": job_id, "status": current, "message": "Cancellation requested"}
+
+
+async def _invalidate_job_lists(job_ids: list[str]) -> None:
+    """New jobs make cached job lists stale, here and in other backend processes."""
+    response_cache.invalidate_tag(LIST_TAG)
+    await redis_client.publish_job_events(job_ids, "submit")
+
+
+def batch_size(request: JobBatchSubmitRequest) -> int:
+    """Number of jobs a batch request expands to, without expanding it."""
+    if request.base is None:
+        return len(request.jobs)
+    return len(request.jobs) + math.prod(len(values) for values in request.grid.values())
+
+
+def expand_batch(request: JobBatchSubmitRequest) -> list[dict[str, Any]]:
+    """Flatten a batch request into raw per-job configs, in submission order."""
+    size = batch_size(request)
+    if size > settings.max_batch_size:
+        raise ValueError(f"Batch of {size} jobs exceeds max_batch_size={settings.max_batch_size}")
+    items = list(request.jobs)
+    if request.base is None:
+        return items
+
+    base = request.base.model_dump(by_alias=True)
+    if not request.grid:
+        return items + [base]
+
+    keys = list(request.grid)
+    for i, values in enumerate(itertools.product(*(request.grid[k] for k in keys))):
+        item = copy.deepcopy(base)
+        for path, value in zip(keys, values):
+            target = item
+            *parents, leaf = path.split(".")
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = value
+        if base.get("name"):
+            item["name"] = f"{base['name']}-{i}"
+        items.append(item)
+    return items
+
+
+def _publish_batch(jobs: list[tuple[str, dict[str, Any]]]) -> dict[str, str]:
+    """Publish all jobs over one broker connection. Returns {job_id: error} for failures."""
+    errors: dict[str, str] = {}
+    with celery_app.producer_or_acquire() as producer:
+        for job_id, payload in jobs:
+            try:
+                celery_app.send_task(
+                    PROCESS_JOB_TASK,
+                    args=[job_id],
+                    kwargs={"payload": payload},
+                    producer=producer,
+                    ignore_result=True,
+                )
+            except Exception as e:
+                errors[job_id] = str(e)
+    return errors
+
+
+async def submit_jobs_batch(request: JobBatchSubmitRequest) -> dict[str, Any]:
+    """
+    Submit many training jobs with one Redis pipeline, one DB transaction
+    and one broker connection. Results are returned in submission order,
+    with per-item errors for configs that failed validation or enqueueing.
+    Items whose config matches an existing job (or an earlier item) return
+    that job instead, marked "memoized".
+    """
+    items = expand_batch(request)
+
+    results: list[dict[str, Any]] = []
+    accepted: list[tuple[dict[str, Any], JobSubmitRequest, dict[str, Any]]] = []
+    for index, raw in enumerate(items):
+        try:
+            job_request = JobSubmitRequest.model_validate(raw)
+        except ValidationError as e:
+            results.append({
+                "index": index,
+                "job_id": None,
+                "status": "rejected",
+                "error": str(e),
+            })
+            continue
+        result = {"index": index, "job_id": str(uuid.uuid4()), "status": JobStatus.QUEUED.value}
+        results.append(result)
+        accepted.append((result, job_request, _build_payload(job_request)))
+
+    # Identical configs (across the batch and earlier submissions) share one job
+    reused = await memoization.resolve({
+        result["job_id"]: payload["config_hash"]
+        for result, job_request, payload in accepted
+        if _memoize(job_request)
+    })
+    outcomes = {"hit": 0, "attached": 0, "miss": 0, "bypassed": 0}
+    for result, job_request, _ in accepted:
+        if result["job_id"] in reused:
+            memo = reused[result["job_id"]]
+            outcomes[memo["memoized"]] += 1
+            result.update(memo)
+        else:
+            outcomes["miss" if _memoize(job_request) else "bypassed"] += 1
+    accepted = [item for item in accepted if "memoized" not in item[0]]
+
+    if accepted:
+        claims = {
+            result["job_id"]: payload["config_hash"]
+            for result, job_request, payload in accepted
+            if _memoize(job_request)
+        }
+        try:
+            await redis_client.queue_jobs({
+                result["job_id"]: _job_data(job_request, payload)
+                for result, job_request, payload in accepted
+            })
+
+            async with async_session_maker() as session:
+                session.add_all([
+                    JobModel(
+                        id=result["job_id"],
+                        name=job_request.name,
+                        status=JobStatus.QUEUED.value,
+                        config=payload,
+                        config_hash=payload["config_hash"],
+                    )
+                    for result, job_request, payload in accepted
+                ])
+                await session.commit()
+        except BaseException:
+            await memoization.release(claims)
+            raise
+
+        try:
+            errors = await _run_in_enqueue_executor(
+                _publish_batch,
+                [(result["job_id"], payload) for result, _, payload in accepted],
+            )
+        except Exception as e:
+            # No broker connection at all: every job failed to enqueue
+            errors = {result["job_id"]: str(e) for result, _, _ in accepted}
+        except BaseException:
+            await memoization.release(claims)
+            raise
+        if errors:
+            await _mark_failed(errors)
+            await memoization.release({job_id: h for job_id, h in claims.items() if job_id in errors})
+            for result, _, _ in accepted:
+                if result["job_id"] in errors:
+                    result["status"] = JobStatus.FAILED.value
+                    result["error"] = errors[result["job_id"]]
+
+        await _invalidate_job_lists([result["job_id"] for result, _, _ in accepted])
+        await memoization.confirm([
+            payload["config_hash"]
+            for result, job_request, payload in accepted
+            if _memoize(job_request) and result["job_id"] not in errors
+        ])
+    await memoization.record(outcomes)
+
+    failed = sum(1 for r in results if r["status"] in (JobStatus.FAILED.value, "rejected"))
+    return {
+        "jobs": results,
+        "submitted": len(results) - failed,
+        "failed": failed,
+        "memoized": outcomes["hit"] + outcomes["attached"],
+    }
+
+
+async def _mark_failed(errors: dict[str, str]) -> None:
+    """Record enqueue failures so the jobs don't sit in `queued` forever."""
+    for job_id, error in errors.items():
+        await redis_client.set_job_status(job_id, JobStatus.FAILED.value, {"error": error})
+    async with async_session_maker() as session:
+        for job_id, error in errors.items():
+            await session.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id)
+                .values(status=JobStatus.FAILED.value, error_message=error)
+            )
+        await session.commit()
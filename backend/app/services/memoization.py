@@ -0,0 +1,230 @@
+"""Result memoization: identical training configs share one job.
+
+A submission's key is the sha256 of its normalized model/training config
+plus seed and code version. Redis maps each key to the job that owns it
+(with the jobs.config_hash column as fallback once the Redis entry
+expires). When a new submission's key is owned by a succeeded job, the
+caller gets that job back instead of training again; if the owner is
+still queued or running, the caller attaches to it. A failed or cancelled
+owner is replaced by the new job.
+
+Every attachment is counted per owner job (attachments()), so whoever
+might cancel the owner can tell whether other submissions rely on it.
+
+A fresh claim only lives for memo_claim_ttl_s until the job is enqueued
+(confirm), so a submitter that dies half-way cannot pin a key to a job
+that never runs; one whose insert or enqueue fails gives it up at once
+(release).
+"""
+
+import hashlib
+import json
+from typing import Any
+
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.database import async_session_maker
+from app.core.redis_client import redis_client
+from app.models.job import JobModel
+from shared import codec
+from shared.schemas.job import JobStatus, JobSubmitRequest
+
+MEMO_PREFIX = "ml_train:memo:"
+MEMO_STATS_KEY = "ml_train:memo_stats"
+ATTACHED_PREFIX = "ml_train:memo_attached:"
+
+# Owner status -> outcome for the new submission
+REUSABLE = {
+    JobStatus.SUCCEEDED.value: "hit",
+    JobStatus.QUEUED.value: "attached",
+    JobStatus.PENDING.value: "attached",
+    JobStatus.RUNNING.value: "attached",
+}
+
+# Replace the owner only if it is still the one we looked at
+_TAKEOVER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Drop a claim only if we still own it
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def config_hash(request: JobSubmitRequest, default_code_version: str = "") -> str:
+    """Canonical hash of what determines a job's result (not its name, owner or priority)."""
+    key = {
+        "model_config": request.architecture_config.model_dump(),
+        "training_config": request.training_config.model_dump(),
+        "seed": request.seed,
+        "code_version": request.code_version or default_code_version,
+    }
+    canonical = json.dumps(key, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def _statuses(job_ids: list[str]) -> dict[str, str]:
+    """Current status per job: Redis first, then the DB. Jobs in neither are still being submitted."""
+    if not job_ids:
+        return {}
+    values = await redis_client.client.mget([f"{redis_client.JOB_STATUS_PREFIX}{j}" for j in job_ids])
+    statuses = {j: codec.loads(v).get("status") for j, v in zip(job_ids, values) if v}
+    missing = [j for j in job_ids if j not in statuses]
+    if missing:
+        async with async_session_maker() as session:
+            rows = await session.execute(select(JobModel.id, JobModel.status).where(JobModel.id.in_(missing)))
+            statuses.update({job_id: status for job_id, status in rows.all()})
+    return {j: statuses.get(j, JobStatus.QUEUED.value) for j in job_ids}
+
+
+async def _owners_from_db(hashes: list[str]) -> dict[str, str]:
+    """Best job per hash from the DB (succeeded, else newest in flight)."""
+    if not hashes:
+        return {}
+    async with async_session_maker() as session:
+        rows = await session.execute(
+            select(JobModel.config_hash, JobModel.id, JobModel.status)
+            .where(JobModel.config_hash.in_(hashes), JobModel.status.in_(list(REUSABLE)))
+            .order_by(JobModel.created_at.desc())
+        )
+        best: dict[str, tuple[str, str]] = {}
+        for h, job_id, status in rows.all():
+            current = best.get(h)
+            if current is None or (status == JobStatus.SUCCEEDED.value and current[1] != JobStatus.SUCCEEDED.value):
+                best[h] = (job_id, status)
+    return {h: job_id for h, (job_id, _) in best.items()}
+
+
+async def resolve(claims: dict[str, str]) -> dict[str, dict[str, Any]]:
+    """
+    Claim config hashes for new jobs ({job_id: config_hash}, in submission order).
+
+    Returns {job_id: {"job_id": existing_id, "status": ..., "memoized": "hit"|"attached"}}
+    for jobs that should reuse an existing job; every other job now owns its
+    hash and must be submitted, then confirmed.
+    """
+    if not claims:
+        return {}
+    settings = get_settings()
+    client = redis_client.client
+    reused: dict[str, dict[str, Any]] = {}
+    first: dict[str, str] = {}  # hash -> first new job carrying it
+    duplicates: dict[str, str] = {}  # later new job -> first new job with the same hash
+    for job_id, h in claims.items():
+        if h in first:
+            duplicates[job_id] = first[h]
+        else:
+            first[h] = job_id
+    hashes = list(first)
+
+    owners = dict(zip(hashes, await client.mget([f"{MEMO_PREFIX}{h}" for h in hashes])))
+    owners = {h: o.decode() for h, o in owners.items() if o}
+    from_db = await _owners_from_db([h for h in hashes if h not in owners])
+    if from_db:
+        # Re-index owners whose Redis entry expired
+        pipe = client.pipeline(transaction=False)
+        for h, owner in from_db.items():
+            pipe.set(f"{MEMO_PREFIX}{h}", owner, ex=settings.memo_ttl_s, nx=True)
+        await pipe.execute()
+        owners.update(from_db)
+
+    statuses = await _statuses(list(set(owners.values())))
+    fresh, takeover = [], []
+    for h in hashes:
+        owner = owners.get(h)
+        if owner is None:
+            fresh.append(h)
+        elif statuses[owner] in REUSABLE:
+            reused[first[h]] = {"job_id": owner, "status": statuses[owner], "memoized": REUSABLE[statuses[owner]]}
+        else:
+            takeover.append(h)
+
+    if fresh or takeover:
+        script = client.register_script(_TAKEOVER)
+        pipe = client.pipeline(transaction=False)
+        for h in fresh:
+            pipe.set(f"{MEMO_PREFIX}{h}", first[h], ex=settings.memo_claim_ttl_s, nx=True)
+        for h in takeover:
+            await script(keys=[f"{MEMO_PREFIX}{h}"], args=[owners[h], first[h], settings.memo_claim_ttl_s], client=pipe)
+        won = await pipe.execute()
+        lost = [h for h, ok in zip(fresh + takeover, won) if not ok]
+        if lost:
+            # Someone else claimed it between our read and write: attach to them
+            winners = await client.mget([f"{MEMO_PREFIX}{h}" for h in lost])
+            for h, winner in zip(lost, winners):
+                if winner:
+                    reused[first[h]] = {"job_id": winner.decode(), "status": JobStatus.QUEUED.value, "memoized": "attached"}
+
+    for job_id, first_job_id in duplicates.items():
+        reused[job_id] = reused.get(first_job_id) or {
+            "job_id": first_job_id,
+            "status": JobStatus.QUEUED.value,
+            "memoized": "attached",
+        }
+    attached = [r["job_id"] for r in reused.values() if r["memoized"] == "attached"]
+    if attached:
+        pipe = client.pipeline(transaction=False)
+        for owner in attached:
+            pipe.incr(f"{ATTACHED_PREFIX}{owner}")
+            pipe.expire(f"{ATTACHED_PREFIX}{owner}", settings.memo_ttl_s)
+        await pipe.execute()
+    return reused
+
+
+async def attachments(job_id: str) -> int:
+    """How many submissions attached to job_id while it was queued or running."""
+    value = await redis_client.client.get(f"{ATTACHED_PREFIX}{job_id}")
+    return int(value) if value else 0
+
+
+async def confirm(hashes: list[str]) -> None:
+    """Keep claims of successfully enqueued jobs for the full memo TTL."""
+    if not hashes:
+        return
+    ttl = get_settings().memo_ttl_s
+    pipe = redis_client.client.pipeline(transaction=False)
+    for h in hashes:
+        pipe.expire(f"{MEMO_PREFIX}{h}", ttl)
+    await pipe.execute()
+
+
+async def release(claims: dict[str, str]) -> None:
+    """Give up claims ({job_id: config_hash}) of jobs that could not be submitted."""
+    if not claims:
+        return
+    client = redis_client.client
+    script = client.register_script(_RELEASE)
+    pipe = client.pipeline(transaction=False)
+    for job_id, h in claims.items():
+        await script(keys=[f"{MEMO_PREFIX}{h}"], args=[job_id], client=pipe)
+    await pipe.execute()
+
+
+async def record(outcomes: dict[str, int]) -> None:
+    """Add to the hit/attached/miss/bypassed counters."""
+    outcomes = {k: v for k, v in outcomes.items() if v}
+    if not outcomes:
+        return
+    pipe = redis_client.client.pipeline(transaction=False)
+    for field, count in outcomes.items():
+        pipe.hincrby(MEMO_STATS_KEY, field, count)
+    await pipe.execute()
+
+
+async def stats() -> dict[str, Any]:
+    raw = await redis_client.client.hgetall(MEMO_STATS_KEY)
+    counts = {k.decode(): int(v) for k, v in raw.items()}
+    for field in ("hit", "attached", "miss", "bypassed"):
+        counts.setdefault(field, 0)
+    looked_up = counts["hit"] + counts["attached"] + counts["miss"]
+    counts["hit_rate"] = (counts["hit"] + counts["attached"]) / looked_up if looked_up else 0.0
+    return counts
@@ -1,49 +1,56 @@
 """Background service: subscribe to Redis metrics channel, store in PostgreSQL."""
 
 import asyncio
-import json
 import logging
+import time
 from typing import Any
 
 import redis.asyncio as redis
 from sqlalchemy import select
 
+from app.core.cache import METRICS_SOURCE
 from app.core.config import get_settings
-from app.core.database import async_session_maker
+from app.core.database import ingest_session_maker
+from app.core.observability import (
+    COLLECTOR_WRITE_SECONDS,
+    INGEST_FAILED,
+    INGEST_INVALID,
+    INGEST_LAG_SECONDS,
+    INGEST_POINTS,
+    INGEST_STORED,
+)
+from app.core.redis_client import RedisClient
 from app.models.job import JobModel, MetricModel
+from shared import codec
 
 logger = logging.getLogger(__name__)
 METRICS_CHANNEL = "ml_train:metrics"
+JOB_EVENTS_CHANNEL = RedisClient.JOB_EVENTS_CHANNEL
 
 
-async def store_metric(job_id: str, step: int, epoch: float, name: str, value: float):
-    """Insert or update metric in DB."""
-    async with async_session_maker() as session:
-        metric = MetricModel(
-            job_id=job_id,
-            step=step,
-            epoch=epoch,
-            name=name,
-            value=value,
+async def store_points(job_id: str, step: int, epoch: float, values: dict[str, float]) -> bool:
+    """Insert one message's metric values, creating the job row if missing (for Redis-only jobs).
+
+    One session and one commit per message, on the ingest pool. Returns True if the job row was created.
+    """
+    async with ingest_session_maker() as session:
+        r = await session.execute(select(JobModel.id).where(JobModel.id == job_id))
+        created = r.scalar_one_or_none() is None
+        if created:
+            session.add(JobModel(id=job_id, status="running", config={}))
+        session.add_all(
+            MetricModel(job_id=job_id, step=step, epoch=epoch, name=name, value=value)
+            for name, value in values.items()
         )
-        session.add(metric)
         await session.commit()
-
-
-async def ensure_job_exists(job_id: str) -> None:
-    """Create job record if missing (for metrics from Redis-only jobs)."""
-    async with async_session_maker() as session:
-        r = await session.execute(select(JobModel).where(JobModel.id == job_id))
-        if r.scalar_one_or_none() is None:
-            job = JobModel(id=job_id, status="running", config={})
-            session.add(job)
-            await session.commit()
+    return created
 
 
 async def run_metrics_collector():
     """Subscribe to Redis metrics channel and persist to PostgreSQL."""
     settings = get_settings()
-    client = redis.from_url(settings.redis_url, decode_responses=True)
+    # Raw bytes: producers may publish msgpack-framed points
+    client = redis.from_url(settings.redis_url, decode_responses=False)
     pubsub = client.pubsub()
     await pubsub.subscribe(METRICS_CHANNEL)
     logger.info(f"Subscribed to {METRICS_CHANNEL}")
@@ -53,17 +60,29 @@ async def run_metrics_collector():
             if message["type"] != "message":
                 continue
             try:
-                data = json.loads(message["data"])
+                data = codec.decode_message(message["data"])
                 job_id = data.get("job_id")
                 step = data.get("step", 0)
                 epoch = data.get("epoch", 0.0)
                 if not job_id:
+                    INGEST_INVALID.inc()
                     continue
-                await ensure_job_exists(job_id)
-                for key in ("loss", "accuracy"):
-                    if key in data:
-                        await store_metric(job_id, step, epoch, key, float(data[key]))
+                start = time.perf_counter()
+                values = {key: float(data[key]) for key in ("loss", "accuracy") if key in data}
+                created = await store_points(job_id, step, epoch, values)
+                COLLECTOR_WRITE_SECONDS.observe(time.perf_counter() - start)
+                INGEST_POINTS.inc(len(values))
+                INGEST_STORED.inc()
+                if "ts" in data:
+                    # Publish time is the trainer's clock: clamp skew instead of recording negative lag
+                    INGEST_LAG_SECONDS.observe(max(time.time() - float(data["ts"]), 0.0))
+                await client.publish(
+                    JOB_EVENTS_CHANNEL,
+                    # A new job row also changes the job lists
+                    codec.dumps({"job_id": job_id, "source": "sync" if created else METRICS_SOURCE}),
+                )
             except Exception as e:
+                INGEST_FAILED.inc()
                 logger.exception("Metrics collect error: %s", e)
     finally:
         await pubsub.unsubscribe(METRICS_CHANNEL)
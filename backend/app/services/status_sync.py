@@ -0,0 +1,264 @@
+"""Background service: drain job status transitions from Redis into PostgreSQL.
+
+The orchestrator appends every transition to a Redis list alongside the
+real-time status key. This service moves them in batches (LMOVE) into a
+per-consumer processing list and writes one UPDATE per job per batch, so
+the jobs table converges without any writes on the read path. The
+processing list is only cleared after the commit:
+- A consumer that dies leaves its batch there, and another consumer moves it
+  back once the dead one's heartbeat expires.
+- A batch that keeps failing is retried job by job after
+  status_sync_max_attempts, and only the failing jobs' updates go to a
+  dead-letter list.
+
+Several backend processes may drain concurrently, so batches can be
+applied out of order. Every UPDATE is guarded by status rank, so a status
+never moves backwards and a terminal status is final.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+import redis.asyncio as redis
+from sqlalchemy import and_, case, func, or_, update
+
+from app.core.config import get_settings
+from app.core.database import ingest_session_maker
+from app.core.redis_client import RedisClient, redis_client
+from app.models.job import JobModel
+from shared import codec
+from shared.schemas.job import JobStatus
+
+logger = logging.getLogger(__name__)
+STATUS_UPDATES_KEY = RedisClient.STATUS_UPDATES_KEY
+PROCESSING_PREFIX = f"{STATUS_UPDATES_KEY}:processing:"
+CONSUMER_PREFIX = f"{STATUS_UPDATES_KEY}:consumer:"
+DEAD_LETTER_KEY = f"{STATUS_UPDATES_KEY}:dead"
+CONSUMER_TTL_S = 30
+RECOVER_EVERY_S = 60.0
+TERMINAL_STATUSES = {
+    JobStatus.SUCCEEDED.value,
+    JobStatus.FAILED.value,
+    JobStatus.CANCELLED.value,
+}
+# Statuses only move forward; anything terminal is final (same ranks as the orchestrator)
+STATUS_RANK = {
+    JobStatus.QUEUED.value: 0,
+    JobStatus.PENDING.value: 1,
+    JobStatus.RUNNING.value: 2,
+    JobStatus.SUCCEEDED.value: 3,
+    JobStatus.FAILED.value: 3,
+    JobStatus.CANCELLED.value: 3,
+}
+_CURRENT_RANK = case(STATUS_RANK, value=JobModel.status, else_=0)
+
+
+def _advances(current: str | None, status: str) -> bool:
+    if current is None:
+        return True
+    if current in TERMINAL_STATUSES:
+        return False
+    return STATUS_RANK.get(status, 0) >= STATUS_RANK.get(current, 0)
+
+
+def fold_status_updates(updates: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Collapse ordered transitions into the column values to write per job."""
+    rows: dict[str, dict[str, Any]] = {}
+    for u in updates:
+        job_id = u.get("job_id")
+        status = u.get("status")
+        if not job_id or not status:
+            continue
+        ts = datetime.fromtimestamp(u.get("updated_at") or time.time(), tz=timezone.utc)
+        row = rows.setdefault(job_id, {})
+        if not _advances(row.get("status"), status):
+            continue  # Pushed out of order by a racing writer
+        row["status"] = status
+        if u.get("k8s_job_name"):
+            row["k8s_job_name"] = u["k8s_job_name"]
+        if status == JobStatus.RUNNING.value:
+            row.setdefault("started_at", ts)
+        if status in TERMINAL_STATUSES:
+            row["finished_at"] = ts
+        if u.get("error"):
+            row["error_message"] = str(u["error"])
+    return rows
+
+
+def _status_guard(status: str):
+    """WHERE clause: the new status moves the row forward (same rank only while not terminal)."""
+    rank = STATUS_RANK.get(status, 0)
+    return or_(
+        _CURRENT_RANK < rank,
+        and_(_CURRENT_RANK == rank, JobModel.status.notin_(TERMINAL_STATUSES)),
+    )
+
+
+async def apply_status_updates(rows: dict[str, dict[str, Any]]) -> None:
+    """Write folded status rows in a single transaction."""
+    if not rows:
+        return
+    async with ingest_session_maker() as session:
+        for job_id, values in rows.items():
+            values = dict(values)
+            if "started_at" in values:
+                # First transition to running wins, including across batches
+                values["started_at"] = func.coalesce(JobModel.started_at, values["started_at"])
+            await session.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id, _status_guard(values["status"]))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        await session.commit()
+
+
+class _Consumer:
+    """One drainer's processing list and heartbeat."""
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.client = client
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.processing = f"{PROCESSING_PREFIX}{self.id}"
+        self.heartbeat = f"{CONSUMER_PREFIX}{self.id}"
+
+    async def beat(self) -> None:
+        await self.client.set(self.heartbeat, 1, ex=CONSUMER_TTL_S)
+
+    async def claim(self, batch_size: int) -> list[bytes]:
+        """The unfinished batch from before a restart, else the next batch (waits up to 5s)."""
+        leftover = await self.client.lrange(self.processing, 0, -1)
+        if leftover:
+            return leftover
+        first = await self.client.blmove(STATUS_UPDATES_KEY, self.processing, 5, "LEFT", "RIGHT")
+        if first is None:
+            return []
+        more = min(await self.client.llen(STATUS_UPDATES_KEY), batch_size - 1)
+        if more <= 0:
+            return [first]
+        pipe = self.client.pipeline(transaction=False)
+        for _ in range(more):
+            pipe.lmove(STATUS_UPDATES_KEY, self.processing, "LEFT", "RIGHT")
+        return [first] + [m for m in await pipe.execute() if m is not None]
+
+    async def done(self) -> None:
+        await self.client.delete(self.processing)
+
+    async def dead_letter(self, entries: list[bytes]) -> None:
+        """Move entries from the processing list to the dead-letter list."""
+        if not entries:
+            return
+        pipe = self.client.pipeline()
+        pipe.rpush(DEAD_LETTER_KEY, *entries)
+        for entry in entries:
+            pipe.lrem(self.processing, 1, entry)
+        await pipe.execute()
+
+    async def recover_orphans(self) -> int:
+        """Put batches of consumers whose heartbeat expired back at the head of the queue, in order."""
+        moved = 0
+        async for key in self.client.scan_iter(match=f"{PROCESSING_PREFIX}*", count=100):
+            key = key.decode() if isinstance(key, bytes) else key
+            consumer = key[len(PROCESSING_PREFIX):]
+            if consumer == self.id or await self.client.exists(f"{CONSUMER_PREFIX}{consumer}"):
+                continue
+            while await self.client.lmove(key, STATUS_UPDATES_KEY, "RIGHT", "LEFT") is not None:
+                moved += 1
+        if moved:
+            logger.warning(f"Requeued {moved} status updates from stopped consumers")
+        return moved
+
+
+def _decode_batch(raw: list[bytes]) -> tuple[list[dict[str, Any]], dict[str, list[bytes]], list[bytes]]:
+    """(updates, raw entries per job, malformed entries)."""
+    updates, by_job, malformed = [], {}, []
+    for r in raw:
+        try:
+            u = codec.loads(r)
+        except codec.CodecError:
+            malformed.append(r)
+            continue
+        if not isinstance(u, dict):
+            malformed.append(r)
+            continue
+        updates.append(u)
+        by_job.setdefault(u.get("job_id"), []).append(r)
+    return updates, by_job, malformed
+
+
+async def _apply_isolated(
+    consumer: _Consumer, rows: dict[str, dict[str, Any]], by_job: dict[str, list[bytes]]
+) -> None:
+    """Apply job by job; dead-letter the updates of jobs whose row still fails."""
+    for job_id, values in rows.items():
+        try:
+            await apply_status_updates({job_id: values})
+        except Exception as e:
+            logger.error(f"Dead-lettering {len(by_job.get(job_id, []))} status updates for {job_id}: {e}")
+            await consumer.dead_letter(by_job.get(job_id, []))
+
+
+async def run_status_sync():
+    """Move status transitions from Redis in batches and persist them."""
+    settings = get_settings()
+    client = redis.from_url(settings.redis_url, decode_responses=False)
+    batch_size = max(settings.status_sync_batch_size, 1)
+    max_attempts = max(settings.status_sync_max_attempts, 1)
+    consumer = _Consumer(client)
+    logger.info(f"Draining {STATUS_UPDATES_KEY} as {consumer.id}")
+    attempts = 0
+    next_recover = 0.0
+
+    try:
+        while True:
+            await consumer.beat()
+            if time.monotonic() >= next_recover:
+                await consumer.recover_orphans()
+                next_recover = time.monotonic() + RECOVER_EVERY_S
+            raw = await consumer.claim(batch_size)
+            if not raw:
+                continue
+
+            updates, by_job, malformed = _decode_batch(raw)
+            if malformed:
+                logger.warning(f"Dead-lettering {len(malformed)} malformed status updates")
+                await consumer.dead_letter(malformed)
+            rows = fold_status_updates(updates)
+            try:
+                await apply_status_updates(rows)
+            except Exception as e:
+                attempts += 1
+                if attempts < max_attempts:
+                    # The batch stays in the processing list and is retried as is
+                    logger.warning(f"Status sync batch failed (attempt {attempts}/{max_attempts}): {e}")
+                    await asyncio.sleep(min(2 ** attempts, 30))
+                    continue
+                await _apply_isolated(consumer, rows, by_job)
+            attempts = 0
+            await consumer.done()
+
+            # Job lists are served from the DB; invalidate them now that it changed
+            await redis_client.publish_job_events(list(rows), "sync")
+    finally:
+        await client.delete(consumer.heartbeat)
+        await client.close()
+
+
+def start_status_sync_background():
+    """Start status sync in a background task."""
+    async def _run():
+        while True:
+            try:
+                await run_status_sync()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception("Status sync crashed: %s", e)
+                await asyncio.sleep(5)
+
+    return asyncio.create_task(_run())
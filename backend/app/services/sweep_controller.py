@@ -0,0 +1,436 @@
+"""Background service: launch sweep trials and stop losing ones early (ASHA).
+
+One backend process at a time holds a Redis lease and acts as controller.
+It subscribes to the metrics stream and, for each end-of-epoch point of a
+sweep trial that lands on a rung (min_epochs * reduction_factor**k epochs),
+records the trial's metric there and cancels the trial unless it is in the
+top 1/reduction_factor of all trials that have reached that rung so far.
+Every tick it also picks up new sweeps, notices finished trials and
+submits waiting trials (through submit_job) up to max_concurrent, so
+capacity freed by a stopped trial goes to the next one.
+
+Decisions, per-trial progress and the epochs saved are stored with the
+sweep. Points published while no controller was subscribed are not
+replayed; affected trials simply run to completion.
+
+Memoization can put several trials (duplicate grid points, or sweeps over
+the same config) on one job. Each of them follows the job, and the job is
+only cancelled once every trial on it has stopped and no submission
+outside the controller's trials has attached to it.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+import redis.asyncio as redis
+from sqlalchemy import select, update
+
+from app.core.config import get_settings
+from app.core.database import async_session_maker
+from app.core.redis_client import redis_client
+from app.models.job import JobModel, MetricModel
+from app.models.sweep import SweepDecisionModel, SweepModel, SweepTrialModel
+from app.services import memoization
+from app.services.job_service import TERMINAL_STATUSES, cancel_job, submit_job
+from shared import codec
+from shared.schemas.job import JobStatus, JobSubmitRequest
+
+logger = logging.getLogger(__name__)
+METRICS_CHANNEL = redis_client.METRICS_CHANNEL
+LEADER_KEY = "ml_train:sweep_controller:leader"
+
+# Renew the lease only if we still hold it
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def rungs_for(min_epochs: int, reduction_factor: int, max_epochs: int) -> list[int]:
+    """Epoch counts at which trials are compared (below max_epochs)."""
+    rungs, r = [], min_epochs
+    while r < max_epochs:
+        rungs.append(r)
+        r *= reduction_factor
+    return rungs
+
+
+def asha_cutoff(values: list[float], reduction_factor: int, mode: str) -> float | None:
+    """
+    Worst value that still continues at a rung: the top 1/reduction_factor
+    of the values recorded there. None (everyone continues) until
+    reduction_factor trials have reached the rung.
+    """
+    if len(values) < reduction_factor:
+        return None
+    ranked = sorted(values, reverse=(mode == "max"))
+    return ranked[max(len(ranked) // reduction_factor, 1) - 1]
+
+
+def should_continue(value: float, cutoff: float | None, mode: str) -> bool:
+    if cutoff is None:
+        return True
+    return value <= cutoff if mode == "min" else value >= cutoff
+
+
+@dataclass
+class TrialState:
+    id: int
+    index: int
+    config: dict[str, Any]
+    status: str
+    job_id: str | None = None
+    owned: bool = True
+    epochs_completed: int = 0
+    last_value: float | None = None
+
+
+@dataclass
+class SweepState:
+    id: str
+    metric: str
+    mode: str
+    reduction_factor: int
+    max_epochs: int
+    max_concurrent: int
+    rungs: list[int]
+    trials: list[TrialState]
+    recorded: dict[int, list[float]] = field(default_factory=dict)
+    epochs_saved: float = 0.0
+
+    def active(self) -> list[TrialState]:
+        return [t for t in self.trials if t.status == "launched"]
+
+    def waiting(self) -> list[TrialState]:
+        return [t for t in self.trials if t.status == "waiting"]
+
+    def epochs_used(self) -> float:
+        return float(sum(t.epochs_completed for t in self.trials if t.owned))
+
+
+class SweepController:
+    """In-memory state of running sweeps, persisted after every change."""
+
+    def __init__(self) -> None:
+        self.sweeps: dict[str, SweepState] = {}
+        # Every active trial following a job (several when memoization shares it)
+        self.by_job: dict[str, list[tuple[SweepState, TrialState]]] = {}
+
+    def _follow(self, sweep: SweepState, trial: TrialState) -> None:
+        self.by_job.setdefault(trial.job_id, []).append((sweep, trial))
+
+    def _unfollow(self, trial: TrialState) -> None:
+        entries = [e for e in self.by_job.get(trial.job_id, []) if e[1] is not trial]
+        if entries:
+            self.by_job[trial.job_id] = entries
+        else:
+            self.by_job.pop(trial.job_id, None)
+
+    async def load_new_sweeps(self) -> None:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(SweepModel).where(SweepModel.status == "running", SweepModel.id.notin_(list(self.sweeps)))
+            )
+            for sweep in result.scalars().all():
+                trials = (await session.execute(
+                    select(SweepTrialModel).where(SweepTrialModel.sweep_id == sweep.id).order_by(SweepTrialModel.index)
+                )).scalars().all()
+                decisions = (await session.execute(
+                    select(SweepDecisionModel).where(SweepDecisionModel.sweep_id == sweep.id)
+                )).scalars().all()
+                self._add(sweep, trials, decisions)
+
+    def _add(self, sweep: SweepModel, trials, decisions) -> None:
+        config = sweep.config
+        max_epochs = int(config["base"]["training_config"]["epochs"])
+        state = SweepState(
+            id=sweep.id,
+            metric=config["metric"],
+            mode=config["mode"],
+            reduction_factor=config["reduction_factor"],
+            max_epochs=max_epochs,
+            max_concurrent=config["max_concurrent"],
+            rungs=rungs_for(config["min_epochs"], config["reduction_factor"], max_epochs),
+            trials=[
+                TrialState(
+                    id=t.id,
+                    index=t.index,
+                    config=t.config,
+                    status=t.status,
+                    job_id=t.job_id,
+                    owned=t.owned,
+                    epochs_completed=t.epochs_completed,
+                    last_value=t.last_value,
+                )
+                for t in trials
+            ],
+            epochs_saved=sweep.epochs_saved,
+        )
+        for d in decisions:
+            state.recorded.setdefault(d.rung, []).append(d.value)
+        self.sweeps[state.id] = state
+        for trial in state.active():
+            self._follow(state, trial)
+        logger.info(f"Controlling sweep {state.id}: {len(state.trials)} trials, rungs {state.rungs}")
+
+    # -- metrics ---------------------------------------------------------------
+
+    async def handle_metric(self, data: dict[str, Any]) -> None:
+        """Apply ASHA to an end-of-epoch point, for every trial following its job."""
+        if not data.get("epoch_end"):
+            return
+        for sweep, trial in list(self.by_job.get(data.get("job_id"), [])):
+            await self._handle_trial_metric(sweep, trial, data)
+
+    async def _handle_trial_metric(self, sweep: SweepState, trial: TrialState, data: dict[str, Any]) -> None:
+        value = data.get(sweep.metric)
+        epochs = int(round(float(data.get("epoch", 0))))
+        if value is None or epochs <= trial.epochs_completed:
+            return
+        trial.epochs_completed = epochs
+        trial.last_value = float(value)
+
+        decision = None
+        if epochs in sweep.rungs:
+            values = sweep.recorded.setdefault(epochs, [])
+            values.append(trial.last_value)
+            cutoff = asha_cutoff(values, sweep.reduction_factor, sweep.mode)
+            keep = should_continue(trial.last_value, cutoff, sweep.mode)
+            decision = SweepDecisionModel(
+                sweep_id=sweep.id,
+                job_id=trial.job_id,
+                rung=epochs,
+                value=trial.last_value,
+                cutoff=cutoff,
+                decision="continue" if keep else "stop",
+                epochs_saved=0.0 if keep else float(sweep.max_epochs - epochs),
+            )
+            if not keep:
+                trial.status = "stopped"
+                sweep.epochs_saved += decision.epochs_saved
+                self._unfollow(trial)
+                logger.info(
+                    f"Sweep {sweep.id}: stopping {trial.job_id} at epoch {epochs} "
+                    f"({sweep.metric}={trial.last_value:.4f}, cutoff {cutoff:.4f})"
+                )
+                if await self._may_cancel(trial.job_id):
+                    await cancel_job(trial.job_id)
+
+        await self._save(sweep, [trial], decision)
+        if trial.status == "stopped":
+            await self._launch(sweep)
+
+    async def _may_cancel(self, job_id: str) -> bool:
+        """True once no trial follows the job and nothing outside our trials attached to it."""
+        if self.by_job.get(job_id):
+            return False
+        trials = [t for s in self.sweeps.values() for t in s.trials if t.job_id == job_id]
+        if not any(t.owned for t in trials):
+            return False  # Another submission owns it
+        ours = sum(1 for t in trials if not t.owned)
+        return await memoization.attachments(job_id) <= ours
+
+    # -- ticks -----------------------------------------------------------------
+
+    async def tick(self) -> None:
+        await self.load_new_sweeps()
+        await self._collect_finished()
+        for sweep in list(self.sweeps.values()):
+            await self._launch(sweep)
+            if not sweep.active() and not sweep.waiting():
+                await self._finish(sweep)
+
+    async def _collect_finished(self) -> None:
+        job_ids = list(self.by_job)
+        if not job_ids:
+            return
+        values = await redis_client.client.mget([f"{redis_client.JOB_STATUS_PREFIX}{j}" for j in job_ids])
+        statuses = {j: codec.loads(v).get("status") for j, v in zip(job_ids, values) if v}
+        missing = [j for j in job_ids if j not in statuses]
+        if missing:
+            async with async_session_maker() as session:
+                rows = await session.execute(select(JobModel.id, JobModel.status).where(JobModel.id.in_(missing)))
+                statuses.update(dict(rows.all()))
+
+        changed: dict[str, tuple[SweepState, list[TrialState]]] = {}
+        for job_id, status in statuses.items():
+            if status not in TERMINAL_STATUSES:
+                continue
+            for sweep, trial in self.by_job.pop(job_id):
+                trial.status = status
+                if status == JobStatus.SUCCEEDED.value:
+                    await self._complete(sweep, trial)
+                changed.setdefault(sweep.id, (sweep, []))[1].append(trial)
+        for sweep, trials in changed.values():
+            await self._save(sweep, trials)
+
+    async def _launch(self, sweep: SweepState) -> None:
+        """Submit waiting trials until max_concurrent are running."""
+        launched = []
+        for trial in sweep.waiting()[: max(sweep.max_concurrent - len(sweep.active()), 0)]:
+            try:
+                job_id, data = await submit_job(JobSubmitRequest.model_validate(trial.config))
+            except Exception as e:
+                logger.exception(f"Sweep {sweep.id}: submitting trial {trial.index} failed: {e}")
+                trial.status = JobStatus.FAILED.value
+                launched.append(trial)
+                continue
+            trial.job_id = job_id
+            # Memoized trials share another job: follow it, but never cancel it
+            trial.owned = data.get("memoized") is None
+            if data["status"] in TERMINAL_STATUSES:
+                trial.status = data["status"]
+                if data["status"] == JobStatus.SUCCEEDED.value:
+                    await self._complete(sweep, trial)
+            else:
+                trial.status = "launched"
+                self._follow(sweep, trial)
+            launched.append(trial)
+        if launched:
+            await self._save(sweep, launched)
+
+    async def _complete(self, sweep: SweepState, trial: TrialState) -> None:
+        """Mark a trial whose job succeeded as fully trained, with the job's final metric value."""
+        trial.epochs_completed = sweep.max_epochs
+        if trial.last_value is None:
+            # Memo hit on a finished job, or points missed while no controller was subscribed
+            trial.last_value = await _last_value(trial.job_id, sweep.metric)
+
+    async def _finish(self, sweep: SweepState) -> None:
+        complete = [t for t in sweep.trials if t.last_value is not None and t.epochs_completed >= sweep.max_epochs]
+        candidates = complete or [t for t in sweep.trials if t.last_value is not None]
+        best = (min if sweep.mode == "min" else max)(candidates, key=lambda t: t.last_value, default=None)
+        async with async_session_maker() as session:
+            await session.execute(
+                update(SweepModel).where(SweepModel.id == sweep.id).values(
+                    status="completed",
+                    finished_at=datetime.now(timezone.utc),
+                    best_job_id=best.job_id if best else None,
+                    best_value=best.last_value if best else None,
+                    epochs_used=sweep.epochs_used(),
+                    epochs_saved=sweep.epochs_saved,
+                )
+            )
+            await session.commit()
+        del self.sweeps[sweep.id]
+        logger.info(
+            f"Sweep {sweep.id} completed: best {best.job_id if best else None}, "
+            f"{sweep.epochs_saved:g} trial-epochs saved"
+        )
+
+    async def _save(
+        self,
+        sweep: SweepState,
+        trials: list[TrialState],
+        decision: SweepDecisionModel | None = None,
+    ) -> None:
+        async with async_session_maker() as session:
+            for t in trials:
+                await session.execute(
+                    update(SweepTrialModel).where(SweepTrialModel.id == t.id).values(
+                        status=t.status,
+                        job_id=t.job_id,
+                        owned=t.owned,
+                        epochs_completed=t.epochs_completed,
+                        last_value=t.last_value,
+                    )
+                )
+            if decision is not None:
+                session.add(decision)
+            await session.execute(
+                update(SweepModel).where(SweepModel.id == sweep.id).values(
+                    epochs_used=sweep.epochs_used(),
+                    epochs_saved=sweep.epochs_saved,
+                )
+            )
+            await session.commit()
+
+
+async def _last_value(job_id: str, metric: str) -> float | None:
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(MetricModel.value)
+            .where(MetricModel.job_id == job_id, MetricModel.name == metric)
+            .order_by(MetricModel.step.desc(), MetricModel.id.desc())
+            .limit(1)
+        )
+    return result.scalar_one_or_none()
+
+
+class _Lease:
+    """Redis lease so only one backend process controls sweeps."""
+
+    def __init__(self, client: redis.Redis, ttl_s: int) -> None:
+        self.client = client
+        self.ttl_s = ttl_s
+        self.token = uuid.uuid4().hex
+        self._renew = client.register_script(_RENEW)
+
+    async def hold(self) -> bool:
+        """Acquire or renew; False if another process holds it."""
+        if await self.client.set(LEADER_KEY, self.token, nx=True, ex=self.ttl_s):
+            return True
+        return bool(await self._renew(keys=[LEADER_KEY], args=[self.token, self.ttl_s]))
+
+
+async def run_sweep_controller():
+    """Hold the controller lease, follow trial metrics and tick the sweeps."""
+    settings = get_settings()
+    client = redis.from_url(settings.redis_url, decode_responses=False)
+    lease = _Lease(client, max(int(settings.sweep_tick_s * 5), 10))
+    controller: SweepController | None = None
+    pubsub = None
+
+    try:
+        while True:
+            if not await lease.hold():
+                if controller is not None:
+                    logger.warning("Lost the sweep controller lease")
+                    controller = None
+                    await pubsub.close()
+                    pubsub = None
+                await asyncio.sleep(settings.sweep_tick_s)
+                continue
+            if controller is None:
+                # Subscribe before loading state so no rung point falls in between
+                pubsub = client.pubsub()
+                await pubsub.subscribe(METRICS_CHANNEL)
+                controller = SweepController()
+                logger.info("Acting as sweep controller")
+
+            deadline = time.monotonic() + settings.sweep_tick_s
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is None or message["type"] != "message":
+                    continue
+                try:
+                    await controller.handle_metric(codec.decode_message(message["data"]))
+                except Exception as e:
+                    logger.exception("Sweep metric handling error: %s", e)
+            await controller.tick()
+    finally:
+        if pubsub is not None:
+            await pubsub.close()
+        await client.close()
+
+
+def start_sweep_controller_background():
+    """Start the sweep controller in a background task."""
+    async def _run():
+        while True:
+            try:
+                await run_sweep_controller()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception("Sweep controller crashed: %s", e)
+                await asyncio.sleep(5)
+
+    return asyncio.create_task(_run())
@@ -0,0 +1,129 @@
+"""Sweep creation and read models. Trials are launched by the sweep controller."""
+
+import uuid
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.core.config import get_settings
+from app.core.database import async_session_maker
+from app.models.sweep import SweepModel, SweepTrialModel
+from app.services.job_service import batch_size, expand_batch
+from shared.schemas.job import JobBatchSubmitRequest, JobSubmitRequest
+from shared.schemas.sweep import SweepCreateRequest
+
+DEFAULT_MODE = {"loss": "min", "accuracy": "max"}
+
+
+async def create_sweep(request: SweepCreateRequest) -> dict[str, Any]:
+    """
+    Validate every trial config up front and store the sweep; the controller
+    picks it up on its next tick. Raises ValueError for invalid sweeps.
+    """
+    settings = get_settings()
+    sweep_id = str(uuid.uuid4())
+    batch = JobBatchSubmitRequest(base=request.base, grid=request.grid)
+    size = batch_size(batch)
+    if size > settings.max_batch_size:
+        raise ValueError(f"Sweep of {size} trials exceeds max_batch_size={settings.max_batch_size}")
+    items = expand_batch(batch)
+
+    trials = []
+    for index, raw in enumerate(items):
+        if not raw.get("name"):
+            raw["name"] = f"{request.name or 'sweep-' + sweep_id[:8]}-{index}"
+        try:
+            trial = JobSubmitRequest.model_validate(raw)
+        except ValidationError as e:
+            raise ValueError(f"Trial {index} is invalid: {e}") from e
+        trials.append(trial)
+
+    config = request.model_dump(mode="json", by_alias=True)
+    config["mode"] = request.mode or DEFAULT_MODE[request.metric]
+    max_epochs = request.base.training_config.epochs
+    async with async_session_maker() as session:
+        session.add(SweepModel(
+            id=sweep_id,
+            name=request.name,
+            status="running",
+            config=config,
+            epochs_budget=float(len(trials) * max_epochs),
+        ))
+        session.add_all([
+            SweepTrialModel(
+                sweep_id=sweep_id,
+                index=index,
+                config=trial.model_dump(mode="json", by_alias=True),
+                status="waiting",
+            )
+            for index, trial in enumerate(trials)
+        ])
+        await session.commit()
+    return {"sweep_id": sweep_id, "status": "running", "trials": len(trials)}
+
+
+def _sweep_summary(sweep: SweepModel) -> dict[str, Any]:
+    return {
+        "id": sweep.id,
+        "name": sweep.name,
+        "status": sweep.status,
+        "metric": sweep.config.get("metric"),
+        "mode": sweep.config.get("mode"),
+        "best_job_id": sweep.best_job_id,
+        "best_value": sweep.best_value,
+        "epochs_budget": sweep.epochs_budget,
+        "epochs_used": sweep.epochs_used,
+        "epochs_saved": sweep.epochs_saved,
+        "saved_fraction": sweep.epochs_saved / sweep.epochs_budget if sweep.epochs_budget else 0.0,
+        "created_at": sweep.created_at.isoformat() if sweep.created_at else None,
+        "finished_at": sweep.finished_at.isoformat() if sweep.finished_at else None,
+    }
+
+
+async def list_sweeps(limit: int = 50) -> dict[str, Any]:
+    async with async_session_maker() as session:
+        result = await session.execute(select(SweepModel).order_by(SweepModel.created_at.desc()).limit(limit))
+        return {"sweeps": [_sweep_summary(s) for s in result.scalars().all()]}
+
+
+async def get_sweep(sweep_id: str) -> dict[str, Any] | None:
+    """Sweep summary with its trials and every early-stopping decision."""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(SweepModel)
+            .where(SweepModel.id == sweep_id)
+            .options(selectinload(SweepModel.trials), selectinload(SweepModel.decisions))
+        )
+        sweep = result.scalar_one_or_none()
+        if sweep is None:
+            return None
+        return {
+            **_sweep_summary(sweep),
+            "config": sweep.config,
+            "trials": [
+                {
+                    "index": t.index,
+                    "name": t.config.get("name"),
+                    "job_id": t.job_id,
+                    "status": t.status,
+                    "owned": t.owned,
+                    "epochs_completed": t.epochs_completed,
+                    "last_value": t.last_value,
+                }
+                for t in sweep.trials
+            ],
+            "decisions": [
+                {
+                    "job_id": d.job_id,
+                    "rung": d.rung,
+                    "value": d.value,
+                    "cutoff": d.cutoff,
+                    "decision": d.decision,
+                    "epochs_saved": d.epochs_saved,
+                    "at": d.created_at.isoformat() if d.created_at else None,
+                }
+                for d in sweep.decisions
+            ],
+        }
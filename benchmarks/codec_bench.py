@@ -0,0 +1,92 @@
+"""
+Microbenchmark: encode/decode cost and size of each available codec on the
+payloads we actually move (metric points, job data, list responses).
+
+    PYTHONPATH=. python -m benchmarks.codec_bench --number 20000
+"""
+
+import argparse
+import json
+import timeit
+from typing import Any, Callable
+
+from shared import codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+METRIC_POINT = {
+    "job_id": "0b7c5b8e-3d2f-4b7e-9a61-2f1f3c0d9e4a",
+    "step": 15630,
+    "epoch": 10.0,
+    "loss": 0.48213912546634674,
+    "accuracy": 0.8312,
+}
+JOB_DATA = {
+    "status": "queued",
+    "name": "resnet18-sweep-17",
+    "config": {
+        "name": "resnet18-sweep-17",
+        "model_config": {"architecture": "resnet18", "num_classes": 10, "pretrained": False, "extra": {}},
+        "training_config": {
+            "epochs": 10, "batch_size": 64, "learning_rate": 0.003, "weight_decay": 0.0001,
+            "world_size": 2, "dataset": "cifar10", "extra": {},
+        },
+    },
+}
+JOB_LIST = {
+    "jobs": [
+        {"id": f"job-{i:05d}", "name": f"trial-{i}", "status": "running", "created_at": "2026-01-01T00:00:00+00:00"}
+        for i in range(50)
+    ],
+}
+PAYLOADS = {"metric_point": METRIC_POINT, "job_data": JOB_DATA, "job_list": JOB_LIST}
+
+
+def _codecs() -> dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = {
+        "stdlib json": (lambda o: json.dumps(o).encode(), json.loads),
+        f"shared.codec ({codec.JSON_BACKEND})": (codec.dumps, codec.loads),
+    }
+    if orjson is not None:
+        codecs["orjson"] = (orjson.dumps, orjson.loads)
+    if msgspec is not None:
+        codecs["msgspec json"] = (msgspec.json.encode, msgspec.json.decode)
+    if msgpack is not None:
+        codecs["msgpack"] = (msgpack.packb, msgpack.unpackb)
+        codecs["shared.codec framed msgpack"] = (
+            lambda o: codec.encode_message(o, "msgpack"),
+            codec.decode_message,
+        )
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'payload':<14} {'codec':<34} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for payload_name, payload in PAYLOADS.items():
+        for name, (encode, decode) in _codecs().items():
+            data = encode(payload)
+            assert decode(data) == payload, f"{name} did not round-trip {payload_name}"
+            enc = min(timeit.repeat(lambda: encode(payload), number=args.number, repeat=3)) / args.number
+            dec = min(timeit.repeat(lambda: decode(data), number=args.number, repeat=3)) / args.number
+            print(f"{payload_name:<14} {name:<34} {len(data):>7} {enc * 1e6:>10.2f} {dec * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Load test for the metrics ingest and query pipeline.
+
+Simulates N trainers publishing metric points to Redis the way
+training.main.publish_metrics does (same channel, payload and encoding),
+plus M dashboard clients polling GET /jobs and GET /jobs/{id}/metrics.
+It reports:
+- End-to-end ingest lag: from publish until the point can be read from the DB.
+- Sustained points per second.
+- Dropped messages: published but never stored.
+- API p50/p99/p999 latency per endpoint.
+
+Lag is measured by polling the metrics table for the (job, step) pairs the
+trainers sent, so it works on SQLite as well as Postgres.
+
+Scenarios are JSON files (see benchmarks/scenarios/), with stages run back
+to back:
+
+    {"name": "ramp", "encoding": "json", "drain_timeout_s": 30,
+     "stages": [{"duration_s": 30, "trainers": 10, "rate_hz": 5, "pollers": 4, "poll_interval_s": 0.5}],
+     "thresholds": {"max_dropped": 0, "max_lag_p99_ms": 2000, "max_api_p99_ms": 250, "max_api_errors": 0}}
+
+Against a running backend (make infra && make backend), with the same
+REDIS_URL/DATABASE_URL:
+    PYTHONPATH=backend:. python -m benchmarks.load_test benchmarks/scenarios/smoke.json
+
+In-process, with SQLite and an in-memory Redis (fakeredis) as stand-ins:
+    DATABASE_URL=sqlite+aiosqlite:///load.db PYTHONPATH=backend:. \\
+        python -m benchmarks.load_test benchmarks/scenarios/smoke.json --in-process --fake-redis
+
+Exits 1 if any of the scenario's thresholds is exceeded.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks.stats import format_summary, percentile, summarize
+
+METRICS_CHANNEL = "ml_train:metrics"
+TRACK_POLL_S = 0.05
+
+
+@dataclass
+class Stage:
+    duration_s: float
+    trainers: int
+    rate_hz: float = 1.0
+    pollers: int = 0
+    poll_interval_s: float = 1.0
+
+
+@dataclass
+class Scenario:
+    name: str
+    stages: list[Stage]
+    encoding: str = "json"
+    drain_timeout_s: float = 30.0
+    thresholds: dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Scenario":
+        raw = json.loads(Path(path).read_text())
+        return cls(
+            name=raw.get("name", Path(path).stem),
+            stages=[Stage(**s) for s in raw["stages"]],
+            encoding=raw.get("encoding", "json"),
+            drain_timeout_s=raw.get("drain_timeout_s", 30.0),
+            thresholds=raw.get("thresholds", {}),
+        )
+
+
+class IngestTracker:
+    """Publish times of every sent point, matched against rows appearing in the metrics table."""
+
+    def __init__(self) -> None:
+        self.pending: dict[tuple[str, int], tuple[float, int]] = {}  # (job_id, step) -> (sent_at, stage)
+        self.lags: dict[int, list[float]] = {}
+        self.sent: dict[int, int] = {}
+        self.unheard = 0  # PUBLISH reached no subscriber: the collector was not listening
+        self.behind = 0  # trainer could not keep its rate
+        self.stored = 0
+        self.first_sent: float | None = None
+        self.last_stored: float | None = None
+
+    def record_sent(self, job_id: str, step: int, sent_at: float, stage: int) -> None:
+        self.pending[(job_id, step)] = (sent_at, stage)
+        self.sent[stage] = self.sent.get(stage, 0) + 1
+        if self.first_sent is None:
+            self.first_sent = sent_at
+
+    def record_stored(self, job_id: str, step: int, seen_at: float) -> None:
+        entry = self.pending.pop((job_id, step), None)
+        if entry is None:
+            return  # Not ours, or a duplicate row
+        sent_at, stage = entry
+        self.lags.setdefault(stage, []).append(seen_at - sent_at)
+        self.stored += 1
+        self.last_stored = seen_at
+
+    async def follow(self, stop: asyncio.Event) -> None:
+        """Poll new metric rows until stop is set."""
+        from sqlalchemy import func, select
+
+        from app.core.database import async_session_maker
+        from app.models.job import MetricModel
+
+        async with async_session_maker() as session:
+            last_id = (await session.execute(select(func.max(MetricModel.id)))).scalar() or 0
+        while not stop.is_set():
+            async with async_session_maker() as session:
+                rows = (await session.execute(
+                    select(MetricModel.id, MetricModel.job_id, MetricModel.step)
+                    .where(MetricModel.id > last_id, MetricModel.name == "loss")
+                    .order_by(MetricModel.id)
+                    .limit(10000)
+                )).all()
+            seen_at = time.time()
+            for row_id, job_id, step in rows:
+                self.record_stored(job_id, step, seen_at)
+                last_id = row_id
+            if len(rows) < 10000:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(stop.wait(), TRACK_POLL_S)
+
+
+@dataclass
+class RunState:
+    stage: int = 0
+    rate_hz: float = 1.0
+    poll_interval_s: float = 1.0
+    job_ids: list[str] = field(default_factory=list)
+
+
+async def trainer(redis_client, encoding: str, state: RunState, tracker: IngestTracker, stop: asyncio.Event) -> None:
+    """Publish points at state.rate_hz (read every step, so stages can change it)."""
+    from shared import codec
+
+    job_id = str(uuid.uuid4())
+    state.job_ids.append(job_id)
+    # Spread trainers over the first interval instead of publishing in lockstep
+    await asyncio.sleep(random.random() / max(state.rate_hz, 1e-6))
+    step = 0
+    next_at = time.monotonic()
+    while not stop.is_set():
+        step += 1
+        sent_at = time.time()
+        payload = {
+            "job_id": job_id,
+            "step": step,
+            "epoch": step / 100,
+            "ts": sent_at,
+            "loss": random.uniform(0.1, 2.5),
+            "accuracy": random.random(),
+        }
+        tracker.record_sent(job_id, step, sent_at, state.stage)
+        if await redis_client.publish(METRICS_CHANNEL, codec.encode_message(payload, encoding)) == 0:
+            tracker.unheard += 1
+        interval = 1.0 / state.rate_hz
+        next_at += interval
+        now = time.monotonic()
+        if next_at < now - interval:
+            # More than a step late: count it and carry on from now rather than bursting to catch up
+            tracker.behind += 1
+            next_at = now
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop.wait(), max(next_at - now, 0))
+
+
+async def poller(
+    http: httpx.AsyncClient,
+    prefix: str,
+    state: RunState,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+    stop: asyncio.Event,
+) -> None:
+    """Dashboard client: list jobs, then fetch one job's metrics, every poll_interval_s."""
+
+    async def timed(name: str, path: str) -> None:
+        start = time.perf_counter()
+        try:
+            resp = await http.get(path)
+            resp.raise_for_status()
+        except httpx.HTTPError:
+            errors[name] = errors.get(name, 0) + 1
+            return
+        latencies.setdefault(name, []).append(time.perf_counter() - start)
+
+    while not stop.is_set():
+        await timed("GET /jobs", f"{prefix}/jobs?limit=50")
+        if state.job_ids:
+            await timed("GET /jobs/{id}/metrics", f"{prefix}/jobs/{random.choice(state.job_ids)}/metrics")
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop.wait(), state.poll_interval_s)
+
+
+def _resize(tasks: list[tuple[asyncio.Task, asyncio.Event]], count: int, start) -> None:
+    """Start or stop tasks until `count` are running."""
+    while len(tasks) < count:
+        stop = asyncio.Event()
+        tasks.append((asyncio.create_task(start(stop)), stop))
+    while len(tasks) > count:
+        _, stop = tasks.pop()
+        stop.set()
+
+
+async def run_scenario(
+    scenario: Scenario,
+    http: httpx.AsyncClient,
+    redis_client,
+    api_prefix: str,
+) -> tuple[IngestTracker, dict[str, list[float]], dict[str, int], float]:
+    tracker = IngestTracker()
+    state = RunState()
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    trainers: list[tuple[asyncio.Task, asyncio.Event]] = []
+    pollers: list[tuple[asyncio.Task, asyncio.Event]] = []
+    all_tasks: list[asyncio.Task] = []
+    track_stop = asyncio.Event()
+    track_task = asyncio.create_task(tracker.follow(track_stop))
+
+    start = time.perf_counter()
+    for index, stage in enumerate(scenario.stages):
+        state.stage, state.rate_hz, state.poll_interval_s = index, stage.rate_hz, stage.poll_interval_s
+        _resize(trainers, stage.trainers, lambda stop: trainer(redis_client, scenario.encoding, state, tracker, stop))
+        _resize(pollers, stage.pollers, lambda stop: poller(http, api_prefix, state, latencies, errors, stop))
+        all_tasks.extend(t for t, _ in trainers + pollers)
+        print(f"stage {index}: {stage.trainers} trainers @ {stage.rate_hz}/s, {stage.pollers} pollers, "
+              f"{stage.duration_s}s", file=sys.stderr)
+        await asyncio.sleep(stage.duration_s)
+    load_wall = time.perf_counter() - start
+
+    _resize(trainers, 0, None)
+    _resize(pollers, 0, None)
+    await asyncio.gather(*set(all_tasks))
+
+    # Let the collector catch up before counting what never arrived
+    deadline = time.monotonic() + scenario.drain_timeout_s
+    while tracker.pending and time.monotonic() < deadline:
+        await asyncio.sleep(TRACK_POLL_S)
+    track_stop.set()
+    await track_task
+    return tracker, latencies, errors, load_wall
+
+
+def _lag_summary(lags: list[float]) -> dict[str, float]:
+    values = sorted(lags)
+    return {
+        "lag_p50_ms": percentile(values, 50) * 1000,
+        "lag_p99_ms": percentile(values, 99) * 1000,
+        "lag_p999_ms": percentile(values, 99.9) * 1000,
+        "lag_max_ms": (values[-1] if values else float("nan")) * 1000,
+    }
+
+
+def build_report(
+    scenario: Scenario,
+    tracker: IngestTracker,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+    load_wall: float,
+) -> dict[str, Any]:
+    sent = sum(tracker.sent.values())
+    ingest_wall = (tracker.last_stored or 0) - (tracker.first_sent or 0)
+    ingest = {
+        "messages_sent": sent,
+        "messages_stored": tracker.stored,
+        "dropped": len(tracker.pending),
+        "unheard": tracker.unheard,
+        "publish_behind": tracker.behind,
+        "sent_per_s": sent / load_wall if load_wall > 0 else 0.0,
+        "stored_per_s": tracker.stored / ingest_wall if ingest_wall > 0 else 0.0,
+        **_lag_summary([lag for lags in tracker.lags.values() for lag in lags]),
+    }
+    stages = [
+        {"stage": i, "trainers": s.trainers, "rate_hz": s.rate_hz, "sent": tracker.sent.get(i, 0),
+         **_lag_summary(tracker.lags.get(i, []))}
+        for i, s in enumerate(scenario.stages)
+    ]
+    api = {
+        name: summarize(latencies.get(name, []), load_wall, errors=errors.get(name, 0))
+        for name in sorted(set(latencies) | set(errors))
+    }
+    return {"scenario": scenario.name, "duration_s": load_wall, "ingest": ingest, "stages": stages, "api": api}
+
+
+def check_thresholds(report: dict[str, Any], thresholds: dict[str, float]) -> list[str]:
+    """
+    Violated thresholds. Comparisons are written so NaN (no samples, e.g. every
+    request failed) fails them, and API errors fail the run unless
+    max_api_errors allows some.
+    """
+    failures = []
+    ingest = report["ingest"]
+    if "max_dropped" in thresholds and ingest["dropped"] > thresholds["max_dropped"]:
+        failures.append(f"dropped {ingest['dropped']} > {thresholds['max_dropped']}")
+    if "max_lag_p99_ms" in thresholds and not ingest["lag_p99_ms"] <= thresholds["max_lag_p99_ms"]:
+        failures.append(f"ingest lag p99 {ingest['lag_p99_ms']:.1f}ms > {thresholds['max_lag_p99_ms']}ms")
+    if "min_stored_per_s" in thresholds and not ingest["stored_per_s"] >= thresholds["min_stored_per_s"]:
+        failures.append(f"stored {ingest['stored_per_s']:.1f}/s < {thresholds['min_stored_per_s']}/s")
+    max_api_errors = thresholds.get("max_api_errors", 0)
+    for name, summary in report["api"].items():
+        if summary["errors"] > max_api_errors:
+            failures.append(f"{name} errors {summary['errors']} > {max_api_errors}")
+        if "max_api_p99_ms" in thresholds and not summary["p99_ms"] <= thresholds["max_api_p99_ms"]:
+            failures.append(f"{name} p99 {summary['p99_ms']:.1f}ms > {thresholds['max_api_p99_ms']}ms")
+    return failures
+
+
+@contextlib.asynccontextmanager
+async def _targets(args: argparse.Namespace):
+    """HTTP client and Redis client for the backend under test."""
+    if args.fake_redis:
+        import fakeredis.aioredis
+        import redis.asyncio
+
+        server = fakeredis.FakeServer()
+        redis.asyncio.from_url = lambda *a, **k: fakeredis.aioredis.FakeRedis(
+            server=server, decode_responses=k.get("decode_responses", False)
+        )
+
+    import redis.asyncio
+
+    from app.core.config import get_settings
+
+    redis_client = redis.asyncio.from_url(args.redis_url or get_settings().redis_url)
+    limits = httpx.Limits(max_connections=args.max_connections)
+    try:
+        if not args.in_process:
+            async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as http:
+                yield http, redis_client
+            return
+
+        from app.main import app
+
+        if args.fake_redis:
+            from app.services import job_service
+            job_service.celery_app.conf.broker_url = "memory://"
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=args.timeout) as http:
+                yield http, redis_client
+    finally:
+        await redis_client.aclose()
+
+
+async def main_async(args: argparse.Namespace, scenario: Scenario) -> dict[str, Any]:
+    from app.core.config import get_settings
+
+    async with _targets(args) as (http, redis_client):
+        tracker, latencies, errors, load_wall = await run_scenario(
+            scenario, http, redis_client, get_settings().api_prefix
+        )
+    return build_report(scenario, tracker, latencies, errors, load_wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", help="Scenario JSON file")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--redis-url", default=None, help="Default: the backend's REDIS_URL")
+    parser.add_argument("--in-process", action="store_true", help="Run the FastAPI app (and collector) in this process")
+    parser.add_argument("--fake-redis", action="store_true", help="Use fakeredis as the Redis stand-in (with --in-process)")
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    if args.fake_redis and not args.in_process:
+        parser.error("--fake-redis needs --in-process (the backend must see the same Redis)")
+
+    scenario = Scenario.load(args.scenario)
+    report = asyncio.run(main_async(args, scenario))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_summary(f"Ingest ({report['scenario']}, {report['duration_s']:.1f}s)", report["ingest"]))
+        for stage in report["stages"]:
+            print(format_summary(f"Stage {stage.pop('stage')}", stage))
+        for name, summary in report["api"].items():
+            print(format_summary(name, summary))
+
+    failures = check_thresholds(report, scenario.thresholds)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Latency summary helpers shared by the benchmark scripts."""
+
+import math
+from typing import Iterable
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in [0, 100]) of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies_s: Iterable[float], wall_s: float, errors: int = 0) -> dict[str, float]:
+    """Summarize request latencies (seconds) as milliseconds plus throughput."""
+    values = sorted(latencies_s)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": len(values) / wall_s if wall_s > 0 else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "p999_ms": percentile(values, 99.9) * 1000,
+        "max_ms": (values[-1] if values else float("nan")) * 1000,
+    }
+
+
+def format_summary(title: str, summary: dict[str, float]) -> str:
+    lines = [title]
+    for key, value in summary.items():
+        lines.append(f"  {key:<16} {value:,.2f}" if isinstance(value, float) else f"  {key:<16} {value}")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+"""
+End-to-end submit latency benchmark: drives POST /jobs at a fixed concurrency.
+
+Against a running backend (make infra && make backend):
+    python -m benchmarks.submit_latency --concurrency 64 --requests 2000
+
+In-process, without uvicorn (still talks to the Redis/Postgres from `make infra`,
+or set DATABASE_URL=sqlite+aiosqlite:///bench.db for a Postgres stand-in). This
+mode also reports event-loop lag, which exposes blocking calls on the loop:
+    PYTHONPATH=backend:. python -m benchmarks.submit_latency --in-process
+
+Use --max-p99-ms to fail (exit 1) on regressions in CI-style runs; any failed
+request fails the run too unless --max-errors allows it.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+
+import httpx
+
+from benchmarks.stats import format_summary, summarize
+
+JOB_BODY = {
+    "name": "bench",
+    "model_config": {"architecture": "resnet18", "num_classes": 10},
+    "training_config": {"epochs": 1, "batch_size": 32},
+}
+
+
+async def _measure_loop_lag(interval_s: float, samples: list[float], stop: asyncio.Event) -> None:
+    """Record how late the loop wakes a sleeping coroutine."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        samples.append(time.perf_counter() - start - interval_s)
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    path: str,
+    remaining: list[int],
+    latencies: list[float],
+    errors: list[str],
+) -> None:
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        start = time.perf_counter()
+        try:
+            resp = await client.post(path, json=JOB_BODY)
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_benchmark(
+    client: httpx.AsyncClient,
+    path: str,
+    concurrency: int,
+    requests: int,
+    warmup: int,
+) -> tuple[list[float], list[str], float]:
+    if warmup:
+        warm = [warmup]
+        await asyncio.gather(*(_worker(client, path, warm, [], []) for _ in range(concurrency)))
+    remaining = [requests]
+    latencies: list[float] = []
+    errors: list[str] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(client, path, remaining, latencies, errors) for _ in range(concurrency)
+    ))
+    return latencies, errors, time.perf_counter() - start
+
+
+@contextlib.asynccontextmanager
+async def _client(args: argparse.Namespace):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            yield client
+        return
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            yield client
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    lag_samples: list[float] = []
+    stop = asyncio.Event()
+    async with _client(args) as client:
+        lag_task = asyncio.create_task(_measure_loop_lag(0.005, lag_samples, stop)) if args.in_process else None
+        latencies, errors, wall = await run_benchmark(
+            client, args.path, args.concurrency, args.requests, args.warmup
+        )
+        stop.set()
+        if lag_task:
+            await lag_task
+
+    summary = summarize(latencies, wall, errors=len(errors))
+    summary["concurrency"] = args.concurrency
+    if lag_samples:
+        summary["max_loop_lag_ms"] = max(lag_samples) * 1000
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/v1/jobs")
+    parser.add_argument("--in-process", action="store_true", help="Run the FastAPI app in this process")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Exit 1 if p99 exceeds this")
+    parser.add_argument("--max-errors", type=int, default=0, help="Exit 1 if more requests than this fail")
+    args = parser.parse_args()
+
+    summary = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_summary(f"POST {args.path}", summary))
+
+    failures = []
+    if summary["errors"] > args.max_errors:
+        failures.append(f"{summary['errors']} failed requests exceed --max-errors {args.max_errors}")
+    # Written so a NaN p99 (no request succeeded) fails too
+    if args.max_p99_ms is not None and not summary["p99_ms"] <= args.max_p99_ms:
+        failures.append(f"p99 {summary['p99_ms']:.2f}ms exceeds --max-p99-ms {args.max_p99_ms}")
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """Celery application for job orchestration."""
 
 from celery import Celery
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -9,6 +10,65 @@ class OrchestratorSettings(BaseSettings):
     trainer_image: str = "ml-trainer:latest"
     namespace: str = "ml-train"
     use_k8s: bool = True  # Set False for local dev without K8s
+    # Where admitted jobs run: "k8s", "local" (subprocesses via the local agent) or
+    # "simulated" (marked succeeded, nothing runs). Empty picks k8s/simulated from use_k8s.
+    executor: str = ""
+    job_active_deadline_s: int = 36000  # K8s kills training Jobs running longer than this
+
+    # Admission scheduler: pool capacity (sum of requests it may hand out)
+    pool_cpu: float = 32.0
+    pool_memory_mi: int = 131072
+    # Job sizing from TrainingConfig
+    cpu_per_rank: float = 1.0
+    memory_base_mi: int = 1024
+    memory_per_rank_mi: int = 1024
+    memory_per_sample_mi: float = 8.0
+    scheduler_limit_ratio: float = 2.0  # K8s limits = requests * ratio
+    scheduler_backfill_wait_s: float = 600.0
+    scheduler_owner_weights: dict[str, float] = {}
+    scheduler_launch_timeout_s: float = 300.0  # admitted but not confirmed launched: requeue after this
+
+    # Shared dataset cache for trainers (training.dataset_cache): a hostPath per node,
+    # or a ReadWriteMany PVC if dataset_cache_pvc is set. Same path inside pods.
+    dataset_cache_dir: str = "/var/cache/ml-train/datasets"
+    dataset_cache_pvc: str = ""
+    dataset_cache_max_gb: float = 50.0
+    dataset_mirror_dir: str = ""  # Host dir with dataset archives, for offline clusters
+    dataset_offline: bool = False
+
+    # Multi-node DDP (TrainingConfig.nodes > 1): Indexed Job + headless Service, torchrun c10d rendezvous
+    ddp_rendezvous_port: int = 29400
+    ddp_max_restarts: int = 3  # torchrun restarts of the whole worker group after a rank fails
+
+    metrics_port: int = 9108  # python -m orchestrator.app.metrics
+
+    # Reconciler (watches Jobs/Pods and pushes status to Redis)
+    reconciler_watch_timeout_s: int = 300
+    reconciler_resync_period_s: int = 600
+    reconciler_watch_pods: bool = True
+
+    # Local executor (python -m orchestrator.app.local_agent on the training host)
+    local_cpus: int | None = None  # Default: every core this process may run on
+    local_memory_mi: int | None = None  # Default: MemTotal minus local_memory_reserve_mi
+    local_memory_reserve_mi: int = 2048
+    local_trainer_dir: str = "trainer"
+    local_python: str = ""  # Default: the agent's own interpreter
+    local_log_dir: str = "/tmp/ml-train/logs"
+    local_poll_interval_s: float = 1.0
+    local_kill_grace_s: float = 10.0
+
+    @property
+    def executor_backend(self) -> str:
+        return self.executor or ("k8s" if self.use_k8s else "simulated")
+
+    @field_validator("scheduler_owner_weights")
+    @classmethod
+    def _positive_weights(cls, weights: dict[str, float]) -> dict[str, float]:
+        # Fair share divides by the weight; a bad one would fail every admission pass
+        bad = {owner: w for owner, w in weights.items() if not w > 0}
+        if bad:
+            raise ValueError(f"scheduler_owner_weights must be > 0, got {bad}")
+        return weights
 
     class Config:
         env_file = ".env"
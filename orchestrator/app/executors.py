@@ -0,0 +1,178 @@
+"""
+Executors run admitted jobs. The admission scheduler decides when a job
+may start; the executor decides where and how:
+
+- k8s: one K8s Job per training job, tracked by the reconciler
+- local: subprocesses on a training host, run by orchestrator.app.local_agent
+- simulated: nothing runs, the job is marked succeeded (dev without K8s)
+
+Every executor releases the job's reservation once it can no longer run,
+either directly or via whatever tracks the job to completion.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from kubernetes.client.rest import ApiException
+
+from orchestrator.app.celery_app import app, settings
+from orchestrator.app.k8s import (
+    build_job_manifest,
+    build_service_manifest,
+    get_k8s_clients,
+    job_id_from_labels,
+    job_nodes,
+    k8s_job_name,
+)
+from orchestrator.app.metrics import k8s_call
+from orchestrator.app.scheduler import ResourceRequest, scheduler
+from orchestrator.app.status import advance_redis_status, get_redis, update_redis_status
+from shared import codec
+
+logger = logging.getLogger(__name__)
+
+LOCAL_LAUNCH_KEY = "ml_train:local:launch"
+LOCAL_CONTROL_KEY = "ml_train:local:control"
+
+
+class Executor(ABC):
+    """Runs admitted scheduler entries."""
+
+    name = "base"
+
+    @abstractmethod
+    def launch(self, entry: dict) -> bool:
+        """Start an admitted entry. Returns False (with the job failed and released) if it could not."""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> None:
+        """Stop a launched job and mark it cancelled."""
+
+
+def release_and_admit(job_id: str) -> None:
+    """Free a job's reservation and let the next pending jobs in."""
+    if scheduler.release(job_id):
+        app.send_task("orchestrator.tasks.admit_pending", ignore_result=True)
+
+
+class SimulatedExecutor(Executor):
+    name = "simulated"
+
+    def launch(self, entry: dict) -> bool:
+        job_id = entry["job_id"]
+        update_redis_status(job_id, "pending")
+        logger.info(f"[DEV] Would run {job_id}. Set EXECUTOR=local or USE_K8S=true for real runs.")
+        update_redis_status(job_id, "succeeded", k8s_job_name="(simulated)")
+        scheduler.release(job_id)
+        return True
+
+    def cancel(self, job_id: str) -> None:
+        update_redis_status(job_id, "cancelled")
+        scheduler.release(job_id)
+
+
+class K8sExecutor(Executor):
+    """One K8s Job per training job; the reconciler reports progress and releases reservations."""
+
+    name = "k8s"
+
+    def launch(self, entry: dict) -> bool:
+        job_id = entry["job_id"]
+        request = ResourceRequest(**entry["request"])
+        name = k8s_job_name(job_id)
+        multi_node = job_nodes(entry["payload"]) > 1
+        try:
+            batch_api, core_api = get_k8s_clients()
+            try:
+                with k8s_call("create_job"):
+                    job = batch_api.create_namespaced_job(
+                        namespace=settings.namespace,
+                        body=build_job_manifest(job_id, entry["payload"], request.k8s_resources()),
+                    )
+                logger.info(f"Created K8s Job {name} for {job_id} after {entry['queue_wait_s']:.1f}s in queue")
+            except ApiException as e:
+                if e.status != 409:
+                    raise
+                with k8s_call("read_job"):
+                    job = batch_api.read_namespaced_job(name, settings.namespace)
+                owner = job_id_from_labels(job.metadata.labels)
+                if owner != job_id:
+                    raise RuntimeError(f"K8s Job {name} already exists for job {owner}")
+                # Redelivered task (acks_late): the Job is ours, only its Service may be missing
+                logger.info(f"K8s Job {name} already exists for {job_id}")
+            if multi_node:
+                try:
+                    self._ensure_service(core_api, job_id, job.metadata.uid)
+                except ApiException:
+                    # Without the Service the pods can never rendezvous; don't leave them waiting
+                    with k8s_call("delete_job"):
+                        batch_api.delete_namespaced_job(name, settings.namespace, propagation_policy="Background")
+                    raise
+        except ApiException as e:
+            logger.exception(f"Failed to create K8s Job: {e}")
+            update_redis_status(job_id, "failed", error=str(e.body))
+            scheduler.release(job_id)
+            return False
+        except Exception as e:
+            logger.exception(f"Failed to launch {job_id} on K8s")
+            update_redis_status(job_id, "failed", error=str(e))
+            scheduler.release(job_id)
+            return False
+        # After the create, and only forward: the reconciler may already have reported
+        # "running", and a redelivery must not move it back
+        advance_redis_status(job_id, "pending", k8s_job_name=name, queue_wait_s=round(entry["queue_wait_s"], 3))
+        return True
+
+    def _ensure_service(self, core_api, job_id: str, job_uid: str) -> None:
+        """Headless Service for a multi-node Job's rendezvous (created after the Job, which owns it)."""
+        try:
+            with k8s_call("create_service"):
+                core_api.create_namespaced_service(settings.namespace, build_service_manifest(job_id, job_uid))
+        except ApiException as e:
+            if e.status != 409:
+                raise
+
+    def cancel(self, job_id: str) -> None:
+        # Cancelled goes first: the reconciler re-reads Redis on DELETED and keeps it
+        update_redis_status(job_id, "cancelled")
+        batch_api, _ = get_k8s_clients()
+        try:
+            with k8s_call("delete_job"):
+                batch_api.delete_namespaced_job(
+                    k8s_job_name(job_id), settings.namespace, propagation_policy="Background"
+                )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+        release_and_admit(job_id)
+
+
+class LocalExecutor(Executor):
+    """Hands jobs to the local agent through Redis; the agent reports status and releases."""
+
+    name = "local"
+
+    def launch(self, entry: dict) -> bool:
+        job_id = entry["job_id"]
+        advance_redis_status(job_id, "pending", queue_wait_s=round(entry["queue_wait_s"], 3))
+        get_redis().rpush(LOCAL_LAUNCH_KEY, codec.dumps(entry))
+        return True
+
+    def cancel(self, job_id: str) -> None:
+        get_redis().rpush(LOCAL_CONTROL_KEY, codec.dumps({"op": "cancel", "job_id": job_id}))
+
+
+EXECUTORS: dict[str, type[Executor]] = {
+    SimulatedExecutor.name: SimulatedExecutor,
+    K8sExecutor.name: K8sExecutor,
+    LocalExecutor.name: LocalExecutor,
+}
+
+
+@lru_cache
+def get_executor() -> Executor:
+    backend = settings.executor_backend
+    if backend not in EXECUTORS:
+        raise ValueError(f"Unknown executor {backend!r}; expected one of {sorted(EXECUTORS)}")
+    return EXECUTORS[backend]()
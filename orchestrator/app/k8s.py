@@ -0,0 +1,177 @@
+"""Kubernetes client setup and training Job manifests."""
+
+import hashlib
+import json
+import re
+from typing import Any
+
+from kubernetes import client, config
+
+from orchestrator.app.celery_app import settings
+
+APP_LABEL = "ml-train-trainer"
+JOB_ID_LABEL = "ml-train/job-id"
+LABEL_SELECTOR = f"app={APP_LABEL}"
+DATASET_MIRROR_MOUNT = "/mnt/dataset-mirror"
+# Indexed Job pod hostnames are <name>-<index> and must stay within a 63-character DNS label
+MAX_JOB_NAME = 52
+_DNS_LABEL = re.compile(r"[a-z0-9]([-a-z0-9]*[a-z0-9])?")
+
+
+def get_k8s_clients():
+    """Load K8s config (in-cluster or kubeconfig)."""
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        try:
+            config.load_kube_config()
+        except config.ConfigException:
+            raise RuntimeError("Could not load Kubernetes config")
+    return client.BatchV1Api(), client.CoreV1Api()
+
+
+def k8s_job_name(job_id: str) -> str:
+    """Job (and Service) name from the full job id, or a hash of it if that is not a valid DNS label."""
+    name = f"ml-train-{job_id}"
+    if len(name) <= MAX_JOB_NAME and _DNS_LABEL.fullmatch(name):
+        return name
+    return f"ml-train-{hashlib.sha256(job_id.encode()).hexdigest()[:32]}"
+
+
+def job_labels(job_id: str) -> dict[str, str]:
+    """Labels on the Job and its pods; the reconciler maps objects back to jobs by these."""
+    return {"app": APP_LABEL, JOB_ID_LABEL: job_id}
+
+
+def job_id_from_labels(labels: dict[str, str] | None) -> str | None:
+    return (labels or {}).get(JOB_ID_LABEL)
+
+
+def dataset_cache_env(mirror_dir: str | None = None) -> dict[str, str]:
+    """Trainer env for training.dataset_cache; mirror_dir is where the mirror is visible to the trainer."""
+    env = {
+        "DATASET_CACHE_DIR": settings.dataset_cache_dir,
+        "DATASET_CACHE_MAX_GB": f"{settings.dataset_cache_max_gb:g}",
+        "DATASET_OFFLINE": "1" if settings.dataset_offline else "0",
+    }
+    if settings.dataset_mirror_dir:
+        env["DATASET_MIRROR"] = mirror_dir or settings.dataset_mirror_dir
+    return env
+
+
+def _dataset_cache_volumes() -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Pod volumes and trainer mounts for the dataset cache (and mirror, if configured)."""
+    if settings.dataset_cache_pvc:
+        cache = {"persistentVolumeClaim": {"claimName": settings.dataset_cache_pvc}}
+    else:
+        cache = {"hostPath": {"path": settings.dataset_cache_dir, "type": "DirectoryOrCreate"}}
+    volumes = [{"name": "dataset-cache", **cache}]
+    mounts = [{"name": "dataset-cache", "mountPath": settings.dataset_cache_dir}]
+    if settings.dataset_mirror_dir:
+        volumes.append({"name": "dataset-mirror", "hostPath": {"path": settings.dataset_mirror_dir, "type": "Directory"}})
+        mounts.append({"name": "dataset-mirror", "mountPath": DATASET_MIRROR_MOUNT, "readOnly": True})
+    return volumes, mounts
+
+
+def job_nodes(payload: dict[str, Any]) -> int:
+    return max(int((payload.get("training_config") or {}).get("nodes", 1)), 1)
+
+
+def rendezvous_endpoint(job_id: str) -> str:
+    """The index-0 pod of a multi-node Job, addressed through its headless Service."""
+    name = k8s_job_name(job_id)
+    return f"{name}-0.{name}.{settings.namespace}.svc.cluster.local:{settings.ddp_rendezvous_port}"
+
+
+def build_job_manifest(
+    job_id: str,
+    payload: dict[str, Any],
+    resources: dict[str, dict[str, str]],
+) -> dict[str, Any]:
+    """
+    Training Job. Timeouts are enforced by K8s via activeDeadlineSeconds.
+
+    Single-node jobs run one pod of training.main. Multi-node jobs are an
+    Indexed Job with one pod per node, each running training.launch (torchrun)
+    against the rendezvous on pod 0; they need build_service_manifest too.
+    """
+    name = k8s_job_name(job_id)
+    labels = job_labels(job_id)
+    nodes = job_nodes(payload)
+    volumes, mounts = _dataset_cache_volumes()
+    env = {
+        "REDIS_URL": f"redis://redis.{settings.namespace}.svc.cluster.local:6379/0",
+        **dataset_cache_env(DATASET_MIRROR_MOUNT),
+    }
+    container = {
+        "name": "trainer",
+        "image": settings.trainer_image,
+        "command": ["python", "-m", "training.main"],
+        "args": [
+            "--job-id", job_id,
+            "--config", json.dumps(payload),
+        ],
+        "resources": resources,
+        "volumeMounts": mounts,
+    }
+    job_spec: dict[str, Any] = {
+        "ttlSecondsAfterFinished": 3600,
+        "backoffLimit": 2,
+        "activeDeadlineSeconds": settings.job_active_deadline_s,
+    }
+    pod_spec: dict[str, Any] = {"restartPolicy": "OnFailure"}
+    if nodes > 1:
+        container["command"] = ["python", "-m", "training.launch"]
+        container["ports"] = [{"name": "rdzv", "containerPort": settings.ddp_rendezvous_port}]
+        env["RDZV_ENDPOINT"] = rendezvous_endpoint(job_id)
+        env["DDP_MAX_RESTARTS"] = str(settings.ddp_max_restarts)
+        job_spec.update(
+            completionMode="Indexed",
+            completions=nodes,
+            parallelism=nodes,
+            backoffLimit=2 * nodes,
+        )
+        # Pod hostnames are <name>-<index>; the subdomain gives them DNS names under the Service
+        pod_spec["subdomain"] = name
+    container["env"] = [{"name": k, "value": v} for k, v in env.items()]
+    return {
+        "apiVersion": "batch/v1",
+        "kind": "Job",
+        "metadata": {
+            "name": name,
+            "namespace": settings.namespace,
+            "labels": labels,
+        },
+        "spec": {
+            **job_spec,
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {**pod_spec, "containers": [container], "volumes": volumes},
+            },
+        },
+    }
+
+
+def build_service_manifest(job_id: str, job_uid: str) -> dict[str, Any]:
+    """
+    Headless Service giving a multi-node Job's pods stable DNS names. Owned by
+    the Job, so it is garbage-collected when the Job is deleted or expires.
+    """
+    name = k8s_job_name(job_id)
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {
+            "name": name,
+            "namespace": settings.namespace,
+            "labels": job_labels(job_id),
+            "ownerReferences": [{"apiVersion": "batch/v1", "kind": "Job", "name": name, "uid": job_uid}],
+        },
+        "spec": {
+            "clusterIP": "None",
+            "selector": job_labels(job_id),
+            # Rendezvous happens before any pod is ready
+            "publishNotReadyAddresses": True,
+            "ports": [{"name": "rdzv", "port": settings.ddp_rendezvous_port}],
+        },
+    }
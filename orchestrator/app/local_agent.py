@@ -0,0 +1,386 @@
+"""
+Local executor agent: runs admitted training jobs as subprocesses on this
+host (training.main, training.ddp_runner for world_size > 1, or
+training.launch --local for multi-node jobs, which runs every node as a
+torchrun process on this host).
+
+Jobs arrive on a Redis list from LocalExecutor. Each job is pinned to its
+own set of cores (ceil of its CPU request) with sched_setaffinity and
+matching thread-count env vars, and the agent kills it when the RSS of its
+process group exceeds its memory limit or it runs past
+job_active_deadline_s. Jobs that do not fit yet wait in the agent. Status
+goes to the usual ml_train:job_status:* keys; when a job ends its
+reservation is released and the next admission pass is triggered.
+
+While it runs, the agent publishes its cores and memory (with a short
+TTL) as the capacity the scheduler admits local jobs against.
+
+The agent owns its children: it is single-threaded and does not survive
+restarts. Runs it finds from a previous agent are killed and marked failed.
+
+Run with: python -m orchestrator.app.local_agent
+"""
+
+import logging
+import math
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from orchestrator.app.celery_app import app, settings
+from orchestrator.app.executors import LOCAL_CONTROL_KEY, LOCAL_LAUNCH_KEY, release_and_admit
+from orchestrator.app.k8s import dataset_cache_env
+from orchestrator.app.scheduler import LOCAL_CAPACITY_KEY, ResourceRequest, local_cores, local_memory_mi
+from orchestrator.app.status import TERMINAL_STATUSES, get_job_statuses, get_redis, update_redis_status
+from shared import codec
+
+logger = logging.getLogger(__name__)
+
+RUNNING_KEY = "ml_train:local:running"
+LOG_TAIL_LINES = 20
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@dataclass
+class LocalRun:
+    job_id: str
+    process: subprocess.Popen
+    cores: list[int]
+    memory_mi: int
+    memory_limit_mi: int
+    started_at: float
+    log_path: Path
+    stop_reason: tuple[str, str | None] | None = None  # (status, error) once we decided to stop it
+    stop_sent_at: float | None = None
+    peak_rss_mi: float = field(default=0.0)
+
+
+def build_command(payload: dict[str, Any], job_id: str, python: str | None = None) -> list[str]:
+    """Same entrypoints as the trainer image: DDP runner for world_size > 1, torchrun nodes for nodes > 1."""
+    training_config = payload.get("training_config") or {}
+    args = ["--job-id", job_id, "--config", codec.dumps(payload).decode()]
+    if int(training_config.get("nodes", 1)) > 1:
+        return [python or sys.executable, "-m", "training.launch", "--local", *args]
+    module = "training.ddp_runner" if int(training_config.get("world_size", 1)) > 1 else "training.main"
+    return [python or sys.executable, "-m", module, *args]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def group_rss_mi(pgid: int) -> float:
+    """Resident memory of every process in a process group, from /proc."""
+    page_mi = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    total = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm may contain spaces; fields after the closing paren are fixed
+        fields = stat[stat.rindex(")") + 2:].split()
+        if int(fields[2]) == pgid:
+            total += int(fields[21])
+    return total * page_mi
+
+
+class LocalAgent:
+    """Packs launched jobs onto this host's cores and memory and supervises them."""
+
+    def __init__(
+        self,
+        redis_client=None,
+        cores: list[int] | None = None,
+        memory_mi: int | None = None,
+        on_finished=release_and_admit,
+    ) -> None:
+        self.redis = redis_client or get_redis()
+        self.cores = cores if cores is not None else local_cores()
+        self.memory_mi = memory_mi if memory_mi is not None else local_memory_mi()
+        self.on_finished = on_finished
+        self.host = socket.gethostname()
+        self.log_dir = Path(settings.local_log_dir)
+        self.python = settings.local_python or sys.executable
+        self.trainer_dir = (REPO_ROOT / settings.local_trainer_dir).resolve()
+        self.free_cores = set(self.cores)
+        self.free_memory_mi = self.memory_mi
+        self.waiting: deque[dict[str, Any]] = deque()
+        self.runs: dict[str, LocalRun] = {}
+        self._stopping = False
+
+    # -- packing ---------------------------------------------------------------
+
+    def _fits(self, request: ResourceRequest) -> bool:
+        return self._cores_needed(request) <= len(self.free_cores) and request.total_memory_mi <= self.free_memory_mi
+
+    def _cores_needed(self, request: ResourceRequest) -> int:
+        return max(math.ceil(request.total_cpu), 1)
+
+    def _start_waiting(self) -> None:
+        """Start every waiting job that fits now, in arrival order (later ones may backfill)."""
+        for _ in range(len(self.waiting)):
+            entry = self.waiting.popleft()
+            if self._fits(ResourceRequest(**entry["request"])):
+                self._start(entry)
+            else:
+                self.waiting.append(entry)
+
+    def _start(self, entry: dict[str, Any]) -> None:
+        job_id = entry["job_id"]
+        request = ResourceRequest(**entry["request"])
+        cores = sorted(self.free_cores)[: self._cores_needed(request)]
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        log_path = self.log_dir / f"{job_id}.log"
+        threads = str(len(cores))
+        env = {
+            **os.environ,
+            "REDIS_URL": settings.redis_url,
+            **dataset_cache_env(),
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(self.trainer_dir), str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+            "OMP_NUM_THREADS": threads,
+            "MKL_NUM_THREADS": threads,
+            # Concurrent DDP jobs on one host must not share a rendezvous port
+            "MASTER_ADDR": "localhost",
+            "MASTER_PORT": str(_free_port()),
+        }
+        try:
+            with open(log_path, "wb") as log:
+                process = subprocess.Popen(
+                    build_command(entry["payload"], job_id, self.python),
+                    cwd=self.trainer_dir,
+                    env=env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    stdin=subprocess.DEVNULL,
+                    # Own session/process group so cancel/kill reaches DDP workers too
+                    start_new_session=True,
+                    preexec_fn=lambda: os.sched_setaffinity(0, cores),
+                )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.exception(f"Failed to start {job_id}")
+            update_redis_status(job_id, "failed", error=f"Local launch failed: {e}")
+            self.on_finished(job_id)
+            return
+
+        self.free_cores.difference_update(cores)
+        self.free_memory_mi -= request.total_memory_mi
+        run = LocalRun(
+            job_id=job_id,
+            process=process,
+            cores=cores,
+            memory_mi=request.total_memory_mi,
+            memory_limit_mi=int(request.total_memory_mi * settings.scheduler_limit_ratio),
+            started_at=time.time(),
+            log_path=log_path,
+        )
+        self.runs[job_id] = run
+        self.redis.hset(RUNNING_KEY, job_id, codec.dumps({"host": self.host, "pid": process.pid}))
+        update_redis_status(
+            job_id,
+            "running",
+            k8s_job_name=f"local:{self.host}/{process.pid}",
+            cores=",".join(map(str, cores)),
+            log_path=str(log_path),
+        )
+        logger.info(f"Started {job_id} as pid {process.pid} on cores {cores}")
+
+    # -- supervision -----------------------------------------------------------
+
+    def _stop(self, run: LocalRun, status: str, error: str | None = None) -> None:
+        """SIGTERM the job's process group; _poll escalates to SIGKILL after the grace period."""
+        if run.stop_reason is None:
+            run.stop_reason = (status, error)
+            run.stop_sent_at = time.monotonic()
+            self._signal(run, signal.SIGTERM)
+
+    def _signal(self, run: LocalRun, sig: int) -> None:
+        try:
+            os.killpg(run.process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _poll(self) -> None:
+        now = time.time()
+        for run in list(self.runs.values()):
+            returncode = run.process.poll()
+            if returncode is not None:
+                self._finish(run, returncode)
+                continue
+            if run.stop_reason is not None:
+                if time.monotonic() - run.stop_sent_at > settings.local_kill_grace_s:
+                    self._signal(run, signal.SIGKILL)
+                continue
+            rss = group_rss_mi(run.process.pid)
+            run.peak_rss_mi = max(run.peak_rss_mi, rss)
+            if rss > run.memory_limit_mi:
+                self._stop(run, "failed", f"Memory limit exceeded: {rss:.0f}Mi > {run.memory_limit_mi}Mi")
+            elif now - run.started_at > settings.job_active_deadline_s:
+                self._stop(run, "failed", f"Deadline exceeded ({settings.job_active_deadline_s}s)")
+
+    def _finish(self, run: LocalRun, returncode: int) -> None:
+        # Reap anything the job left behind in its group
+        self._signal(run, signal.SIGKILL)
+        del self.runs[run.job_id]
+        self.free_cores.update(run.cores)
+        self.free_memory_mi += run.memory_mi
+        self.redis.hdel(RUNNING_KEY, run.job_id)
+
+        extra = {"exit_code": returncode, "peak_rss_mi": round(run.peak_rss_mi)}
+        if run.stop_reason is not None:
+            status, error = run.stop_reason
+        elif returncode == 0:
+            status, error = "succeeded", None
+        else:
+            status, error = "failed", f"Exited with code {returncode}:\n{self._log_tail(run.log_path)}"
+        if error:
+            extra["error"] = error
+        update_redis_status(run.job_id, status, **extra)
+        logger.info(f"{run.job_id} {status} (exit {returncode}) after {time.time() - run.started_at:.1f}s")
+        self.on_finished(run.job_id)
+
+    @staticmethod
+    def _log_tail(path: Path) -> str:
+        try:
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(f.tell() - 16384, 0))
+                lines = f.read().decode(errors="replace").splitlines()
+        except OSError:
+            return ""
+        return "\n".join(lines[-LOG_TAIL_LINES:])
+
+    # -- commands --------------------------------------------------------------
+
+    def handle_launch(self, entry: dict[str, Any]) -> None:
+        job_id = entry["job_id"]
+        if job_id in self.runs or any(e["job_id"] == job_id for e in self.waiting):
+            return
+        if get_job_statuses([job_id]).get(job_id) in TERMINAL_STATUSES:
+            return  # Cancelled before the launch reached us
+        request = ResourceRequest(**entry["request"])
+        if self._cores_needed(request) > len(self.cores) or request.total_memory_mi > self.memory_mi:
+            update_redis_status(job_id, "failed", error=f"Job does not fit on {self.host}")
+            self.on_finished(job_id)
+            return
+        self.waiting.append(entry)
+        self._start_waiting()
+
+    def handle_cancel(self, job_id: str) -> None:
+        run = self.runs.get(job_id)
+        if run is not None:
+            self._stop(run, "cancelled")
+            return
+        for entry in list(self.waiting):
+            if entry["job_id"] == job_id:
+                self.waiting.remove(entry)
+                break
+        else:
+            if get_job_statuses([job_id]).get(job_id) in TERMINAL_STATUSES:
+                return  # Finished before the cancel arrived
+        update_redis_status(job_id, "cancelled")
+        self.on_finished(job_id)
+
+    def reap_orphans(self) -> None:
+        """Kill and fail runs left by a previous agent on this host; we cannot tell how they end."""
+        for job_id, value in self.redis.hgetall(RUNNING_KEY).items():
+            job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+            info = codec.loads(value)
+            if info.get("host") != self.host or job_id in self.runs:
+                continue
+            try:
+                os.killpg(info["pid"], signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            self.redis.hdel(RUNNING_KEY, job_id)
+            update_redis_status(job_id, "failed", error="Local agent restarted while the job was running")
+            self.on_finished(job_id)
+            logger.warning(f"Reaped orphaned run {job_id} (pid {info.get('pid')})")
+
+    # -- main loop -------------------------------------------------------------
+
+    def publish_capacity(self) -> None:
+        """Advertise this host's pool to the scheduler; it expires soon after the agent stops."""
+        ttl = max(math.ceil(settings.local_poll_interval_s * 5), 10)
+        self.redis.set(LOCAL_CAPACITY_KEY, codec.dumps({
+            "cpu": float(len(self.cores)),
+            "memory_mi": self.memory_mi,
+            "host": self.host,
+            "updated_at": time.time(),
+        }), ex=ttl)
+
+    def step(self, timeout: float) -> None:
+        """Handle at most one command (control first), then supervise running jobs."""
+        self.publish_capacity()
+        item = self.redis.blpop([LOCAL_CONTROL_KEY, LOCAL_LAUNCH_KEY], timeout=timeout)
+        if item is not None:
+            key, value = item
+            key = key.decode() if isinstance(key, bytes) else key
+            message = codec.loads(value)
+            if key == LOCAL_LAUNCH_KEY:
+                self.handle_launch(message)
+            elif message.get("op") == "cancel":
+                self.handle_cancel(message["job_id"])
+        self._poll()
+        self._start_waiting()
+
+    def run(self) -> None:
+        logger.info(
+            f"Local agent on {self.host}: {len(self.cores)} cores, {self.memory_mi}Mi, "
+            f"trainer at {self.trainer_dir}"
+        )
+        self.reap_orphans()
+        self.publish_capacity()
+        # Jobs that waited for an agent to appear can be admitted now
+        app.send_task("orchestrator.tasks.admit_pending", ignore_result=True)
+        while not self._stopping:
+            try:
+                self.step(settings.local_poll_interval_s)
+            except Exception as e:
+                logger.exception(f"Local agent loop failed: {e}")
+                time.sleep(settings.local_poll_interval_s)
+        self.shutdown()
+
+    def stop(self, *_args) -> None:
+        self._stopping = True
+
+    def shutdown(self) -> None:
+        """Stop every run; nobody would supervise them after we exit."""
+        self.redis.delete(LOCAL_CAPACITY_KEY)
+        for run in self.runs.values():
+            self._stop(run, "failed", "Local agent stopped")
+        deadline = time.monotonic() + settings.local_kill_grace_s
+        while self.runs and time.monotonic() < deadline:
+            self._poll()
+            time.sleep(0.2)
+        for run in list(self.runs.values()):
+            self._signal(run, signal.SIGKILL)
+            self._finish(run, run.process.wait())
+        for entry in self.waiting:
+            update_redis_status(entry["job_id"], "failed", error="Local agent stopped before the job started")
+            self.on_finished(entry["job_id"])
+        self.waiting.clear()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    agent = LocalAgent()
+    signal.signal(signal.SIGTERM, agent.stop)
+    signal.signal(signal.SIGINT, agent.stop)
+    agent.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Prometheus exporter for the orchestrator.
+
+Celery workers are prefork processes and the reconciler and local agent
+run separately, so nothing here is kept in process memory. K8s API calls
+add their latency to a histogram hash in Redis (a few HINCRBYs next to a
+multi-millisecond API call), and admission adds each job's queue wait
+the same way. This exporter reads those hashes plus queue lengths, job
+statuses and scheduler state from Redis at scrape time.
+
+Run with: python -m orchestrator.app.metrics   (serves :METRICS_PORT/metrics)
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import REGISTRY, disable_created_metrics, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+from orchestrator.app.celery_app import settings
+from orchestrator.app.scheduler import PENDING_KEY, QUEUE_WAIT_BUCKETS, QUEUE_WAIT_KEY, STATS_KEY
+from orchestrator.app.status import JOB_STATUS_PREFIX, STATUS_UPDATES_KEY, get_redis
+from shared import codec
+
+logger = logging.getLogger(__name__)
+
+K8S_LATENCY_KEY = "ml_train:obs:k8s_api"
+K8S_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CELERY_QUEUES = ("celery",)
+
+
+def _cumulative(counts: dict[str, float], bounds) -> list[tuple[str, float]]:
+    """Prometheus buckets from the per-bucket counts kept in Redis."""
+    cumulative, buckets = 0.0, []
+    for bound in (*map(str, bounds), "+Inf"):
+        cumulative += counts.get(bound, 0.0)
+        buckets.append((bound, cumulative))
+    return buckets
+
+
+def observe_k8s_call(op: str, seconds: float, failed: bool = False) -> None:
+    """Add one K8s API call to the shared histogram (bucket counts are not cumulative here)."""
+    bucket = next((str(b) for b in K8S_BUCKETS if seconds <= b), "+Inf")
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hincrby(K8S_LATENCY_KEY, f"{op}|{bucket}", 1)
+    pipe.hincrbyfloat(K8S_LATENCY_KEY, f"{op}|sum", seconds)
+    if failed:
+        pipe.hincrby(K8S_LATENCY_KEY, f"{op}|errors", 1)
+    pipe.execute()
+
+
+@contextmanager
+def k8s_call(op: str) -> Iterator[None]:
+    """Time a K8s API call: `with k8s_call("create_job"): batch_api.create_namespaced_job(...)`."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        try:
+            observe_k8s_call(op, time.perf_counter() - start, failed)
+        except Exception as e:  # Never fail the call because metrics could not be recorded
+            logger.debug(f"Could not record K8s call latency: {e}")
+
+
+class OrchestratorCollector:
+    """Reads orchestrator state from Redis on every scrape."""
+
+    def __init__(self, redis_client=None) -> None:
+        self._redis = redis_client
+        self.scrape_errors: Counter[str] = Counter()
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def describe(self):
+        # Families are only known after reading Redis; don't touch it at registration
+        return []
+
+    def collect(self):
+        """Every source is read on its own: one failing costs its families, not the whole scrape."""
+        r = self.redis
+        sources = (
+            ("redis", self._roundtrip),
+            ("queues", lambda r: [self._queues(r)]),
+            ("jobs", lambda r: [self._jobs_by_status(r)]),
+            ("scheduler", self._scheduler),
+            ("k8s_latency", self._k8s_latency),
+        )
+        for source, read in sources:
+            try:
+                families = list(read(r))
+            except Exception as e:
+                self.scrape_errors[source] += 1
+                logger.warning(f"Metrics scrape of {source} failed: {e}")
+                if source == "redis":
+                    break  # Everything else reads Redis too
+                continue
+            yield from families
+
+        errors = CounterMetricFamily(
+            "ml_train_scrape_errors", "Failures reading scrape-time metrics", labels=["source"]
+        )
+        for source, _ in sources:
+            errors.add_metric([source], self.scrape_errors[source])
+        yield errors
+
+    def _roundtrip(self, r):
+        start = time.perf_counter()
+        r.ping()
+        roundtrip = GaugeMetricFamily("ml_train_orchestrator_redis_roundtrip_seconds", "Redis PING round-trip")
+        roundtrip.add_metric([], time.perf_counter() - start)
+        yield roundtrip
+
+    def _queues(self, r) -> GaugeMetricFamily:
+        from orchestrator.app.executors import LOCAL_LAUNCH_KEY  # executors import this module
+
+        family = GaugeMetricFamily("ml_train_orchestrator_queue_length", "Queued work by queue", labels=["queue"])
+        pipe = r.pipeline(transaction=False)
+        for queue in CELERY_QUEUES:
+            pipe.llen(queue)
+        pipe.llen(STATUS_UPDATES_KEY)
+        pipe.llen(LOCAL_LAUNCH_KEY)
+        pipe.hlen(PENDING_KEY)
+        names = (*CELERY_QUEUES, "status_updates", "local_launch", "admission_pending")
+        for name, length in zip(names, pipe.execute()):
+            family.add_metric([name], length)
+        return family
+
+    def _jobs_by_status(self, r) -> GaugeMetricFamily:
+        """Real-time statuses; the keys expire after a day, so this covers recent jobs."""
+        counts: Counter[str] = Counter()
+        keys = []
+        for key in r.scan_iter(match=f"{JOB_STATUS_PREFIX}*", count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                counts.update(self._statuses(r, keys))
+                keys = []
+        counts.update(self._statuses(r, keys))
+        family = GaugeMetricFamily(
+            "ml_train_orchestrator_jobs", "Jobs by real-time status (last 24h)", labels=["status"]
+        )
+        for status in ("queued", "pending", "running", "succeeded", "failed", "cancelled"):
+            counts.setdefault(status, 0)
+        for status, count in sorted(counts.items()):
+            family.add_metric([status], count)
+        return family
+
+    @staticmethod
+    def _statuses(r, keys: list) -> list[str]:
+        if not keys:
+            return []
+        return [codec.loads(v).get("status") or "unknown" for v in r.mget(keys) if v]
+
+    def _scheduler(self, r):
+        raw = r.get(STATS_KEY)
+        stats = codec.loads(raw) if raw else {}
+        for field, help_text in (
+            ("capacity_cpu", "Pool CPU capacity"),
+            ("capacity_memory_mi", "Pool memory capacity (Mi)"),
+            ("reserved_cpu", "CPU reserved by admitted jobs"),
+            ("reserved_memory_mi", "Memory reserved by admitted jobs (Mi)"),
+            ("utilization", "Dominant-resource share of the pool in use"),
+            ("running", "Admitted jobs holding reservations"),
+        ):
+            if stats.get(field) is not None:  # null: unbounded or unknown capacity
+                family = GaugeMetricFamily(f"ml_train_scheduler_{field}", help_text)
+                family.add_metric([], float(stats[field]))
+                yield family
+
+        waits = {k.decode(): float(v) for k, v in r.hgetall(QUEUE_WAIT_KEY).items()}
+        histogram = HistogramMetricFamily(
+            "ml_train_scheduler_queue_wait_seconds", "Time from enqueue to admission"
+        )
+        histogram.add_metric([], _cumulative(waits, QUEUE_WAIT_BUCKETS), sum_value=waits.get("sum", 0.0))
+        yield histogram
+
+    def _k8s_latency(self, r):
+        raw = {k.decode(): v for k, v in r.hgetall(K8S_LATENCY_KEY).items()}
+        ops: dict[str, dict[str, float]] = {}
+        for field, value in raw.items():
+            op, _, part = field.rpartition("|")
+            ops.setdefault(op, {})[part] = float(value)
+        histogram = HistogramMetricFamily(
+            "ml_train_k8s_api_duration_seconds", "K8s API call latency", labels=["op"]
+        )
+        errors = CounterMetricFamily("ml_train_k8s_api_errors", "K8s API calls that raised", labels=["op"])
+        for op, parts in sorted(ops.items()):
+            histogram.add_metric([op], _cumulative(parts, K8S_BUCKETS), sum_value=parts.get("sum", 0.0))
+            errors.add_metric([op], parts.get("errors", 0.0))
+        yield histogram
+        yield errors
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    disable_created_metrics()
+    REGISTRY.register(OrchestratorCollector())
+    start_http_server(settings.metrics_port)
+    logger.info(f"Serving orchestrator metrics on :{settings.metrics_port}/metrics")
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == "__main__":
+    main()
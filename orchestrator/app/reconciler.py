@@ -0,0 +1,282 @@
+"""
+Watch-based reconciler: one process watches all training Jobs (and their
+Pods) in the namespace and pushes status changes to Redis. When a job
+finishes it releases the job's admission reservation and triggers the
+next admission pass.
+
+Replaces per-task polling. Each watch is a list (full resync) followed by a
+watch from the list's resourceVersion; on 410 Gone, stream errors or every
+reconciler_resync_period_s it relists. Statuses only move forward and
+terminal statuses are never overwritten, so replaying events after a
+restart is harmless.
+
+Run with: python -m orchestrator.app.reconciler
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+from orchestrator.app.celery_app import app, settings
+from orchestrator.app.executors import release_and_admit
+from orchestrator.app.k8s import LABEL_SELECTOR, get_k8s_clients, job_id_from_labels
+from orchestrator.app.metrics import k8s_call
+from orchestrator.app.scheduler import scheduler
+from orchestrator.app.status import (
+    STATUS_RANK,
+    TERMINAL_STATUSES,
+    advance_redis_status,
+    get_job_statuses,
+)
+
+logger = logging.getLogger(__name__)
+
+StatusUpdate = tuple[str, dict[str, Any]]
+
+
+def status_from_job(job) -> StatusUpdate | None:
+    """Derive (status, extra) from a V1Job, or None if pods should decide."""
+    extra = {"k8s_job_name": job.metadata.name}
+    for cond in (job.status and job.status.conditions) or []:
+        if cond.status != "True":
+            continue
+        if cond.type == "Complete":
+            return "succeeded", extra
+        if cond.type == "Failed":
+            return "failed", {**extra, "error": cond.message or cond.reason or "K8s Job failed"}
+    if job.status and job.status.ready:
+        return "running", extra
+    return None
+
+
+def status_from_pod(pod) -> StatusUpdate | None:
+    """Derive (status, extra) from a V1Pod. Terminal pod phases are left to the Job."""
+    extra = {"k8s_job_name": (pod.metadata.labels or {}).get("job-name")}
+    phase = pod.status.phase if pod.status else None
+    if phase == "Running":
+        return "running", extra
+    if phase == "Pending":
+        for cs in (pod.status.container_statuses or []):
+            if cs.state and cs.state.waiting and cs.state.waiting.reason:
+                return "pending", {**extra, "reason": cs.state.waiting.reason}
+        return "pending", extra
+    return None
+
+
+class JobReconciler:
+    """
+    Pushes K8s Job/Pod state to Redis. All K8s and Redis access is injected,
+    so it can run against a fake API in tests.
+    """
+
+    def __init__(
+        self,
+        batch_api,
+        core_api,
+        namespace: str,
+        publish: Callable[..., bool] = advance_redis_status,
+        read_statuses: Callable[[list[str]], dict[str, str | None]] = get_job_statuses,
+        watch_factory: Callable[[], Any] = watch.Watch,
+        watch_timeout_s: int = 300,
+        resync_period_s: int = 600,
+        watch_pods: bool = True,
+        on_terminal: Callable[[str], None] | None = None,
+        on_resync: Callable[[set[str]], None] | None = None,
+    ) -> None:
+        self.batch_api = batch_api
+        self.core_api = core_api
+        self.namespace = namespace
+        self.publish = publish
+        self.read_statuses = read_statuses
+        self.watch_factory = watch_factory
+        self.watch_timeout_s = watch_timeout_s
+        self.resync_period_s = resync_period_s
+        self.watch_pods = watch_pods
+        self.on_terminal = on_terminal
+        self.on_resync = on_resync
+        self._known: dict[str, str | None] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # -- state ---------------------------------------------------------------
+
+    def seed(self, job_ids: list[str]) -> None:
+        """Load current Redis statuses for jobs we have not seen (e.g. after a restart)."""
+        with self._lock:
+            missing = [j for j in job_ids if j not in self._known]
+        if not missing:
+            return
+        statuses = self.read_statuses(missing)
+        with self._lock:
+            for job_id in missing:
+                self._known.setdefault(job_id, statuses.get(job_id))
+
+    def apply(self, job_id: str, update: StatusUpdate | None) -> bool:
+        """
+        Publish update if it moves the job forward. Returns True if published.
+        _known only skips updates that are certainly stale; the publish itself
+        re-checks the rank against Redis, where other writers (cancel, executors) land.
+        """
+        if update is None:
+            return False
+        status, extra = update
+        self.seed([job_id])
+        with self._lock:
+            current = self._known.get(job_id)
+            if current in TERMINAL_STATUSES:
+                return False
+            if current is not None and STATUS_RANK.get(status, 0) <= STATUS_RANK.get(current, 0):
+                return False
+        published = self.publish(job_id, status, **{k: v for k, v in extra.items() if v is not None})
+        with self._lock:
+            if published:
+                self._known[job_id] = status
+            else:
+                # Someone else moved it further; re-read Redis next time
+                self._known.pop(job_id, None)
+        return published
+
+    def forget(self, job_id: str) -> None:
+        with self._lock:
+            self._known.pop(job_id, None)
+
+    # -- event handling ------------------------------------------------------
+
+    def handle_job_event(self, event_type: str, job) -> None:
+        job_id = job_id_from_labels(job.metadata.labels)
+        if not job_id:
+            return
+        update = status_from_job(job)
+        if event_type == "DELETED":
+            # Re-read Redis first: a cancelled job's status is written before its Job is deleted
+            self.forget(job_id)
+            # Deleted before finishing (e.g. by hand): don't leave it running forever
+            update = update or ("failed", {"error": "K8s Job deleted"})
+        self.apply(job_id, update)
+        if update and update[0] in TERMINAL_STATUSES and self.on_terminal:
+            # Also for already-known terminal jobs, so a missed release is retried on resync
+            self.on_terminal(job_id)
+        if event_type == "DELETED":
+            self.forget(job_id)
+
+    def handle_pod_event(self, event_type: str, pod) -> None:
+        job_id = job_id_from_labels(pod.metadata.labels)
+        if not job_id or event_type == "DELETED":
+            return
+        self.apply(job_id, status_from_pod(pod))
+
+    # -- list + watch --------------------------------------------------------
+
+    def resync_jobs(self) -> str:
+        """List all training Jobs, reconcile each, return the list resourceVersion."""
+        with k8s_call("list_jobs"):
+            jobs = self.batch_api.list_namespaced_job(self.namespace, label_selector=LABEL_SELECTOR)
+        self.seed([j for j in (job_id_from_labels(o.metadata.labels) for o in jobs.items) if j])
+        for job in jobs.items:
+            self.handle_job_event("ADDED", job)
+        if self.on_resync:
+            self.on_resync({j for j in (job_id_from_labels(o.metadata.labels) for o in jobs.items) if j})
+        logger.info(f"Resynced {len(jobs.items)} Jobs")
+        return jobs.metadata.resource_version
+
+    def resync_pods(self) -> str:
+        with k8s_call("list_pods"):
+            pods = self.core_api.list_namespaced_pod(self.namespace, label_selector=LABEL_SELECTOR)
+        self.seed([j for j in (job_id_from_labels(o.metadata.labels) for o in pods.items) if j])
+        for pod in pods.items:
+            self.handle_pod_event("ADDED", pod)
+        return pods.metadata.resource_version
+
+    def _watch_loop(self, kind: str, resync: Callable[[], str], list_fn, handler) -> None:
+        """List, then watch from the listed resourceVersion; relist on 410 or periodically."""
+        resource_version = None
+        last_resync = 0.0
+        while not self._stop.is_set():
+            try:
+                if resource_version is None or time.monotonic() - last_resync > self.resync_period_s:
+                    resource_version = resync()
+                    last_resync = time.monotonic()
+                w = self.watch_factory()
+                for event in w.stream(
+                    list_fn,
+                    self.namespace,
+                    label_selector=LABEL_SELECTOR,
+                    resource_version=resource_version,
+                    timeout_seconds=self.watch_timeout_s,
+                ):
+                    if self._stop.is_set():
+                        w.stop()
+                        break
+                    obj = event["object"]
+                    if event["type"] == "ERROR":
+                        code = obj.get("code") if isinstance(obj, dict) else None
+                        logger.warning(f"{kind} watch error (code={code}); relisting")
+                        resource_version = None
+                        break
+                    resource_version = obj.metadata.resource_version
+                    handler(event["type"], obj)
+            except ApiException as e:
+                if e.status != 410:
+                    logger.exception(f"{kind} watch failed: {e}")
+                    self._stop.wait(5)
+                resource_version = None
+            except Exception as e:
+                logger.exception(f"{kind} watch crashed: {e}")
+                resource_version = None
+                self._stop.wait(5)
+
+    def run(self) -> None:
+        """Run the Job watch (and Pod watch) until stop() is called."""
+        threads = [threading.Thread(
+            target=self._watch_loop,
+            args=("Job", self.resync_jobs, self.batch_api.list_namespaced_job, self.handle_job_event),
+            name="reconcile-jobs",
+            daemon=True,
+        )]
+        if self.watch_pods:
+            threads.append(threading.Thread(
+                target=self._watch_loop,
+                args=("Pod", self.resync_pods, self.core_api.list_namespaced_pod, self.handle_pod_event),
+                name="reconcile-pods",
+                daemon=True,
+            ))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _release_missing(active_job_ids: set[str]) -> None:
+    scheduler.release_missing(active_job_ids)
+    # Periodic pass so nothing waits forever on a missed trigger
+    app.send_task("orchestrator.tasks.admit_pending", ignore_result=True)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    batch_api, core_api = get_k8s_clients()
+    reconciler = JobReconciler(
+        batch_api,
+        core_api,
+        settings.namespace,
+        watch_timeout_s=settings.reconciler_watch_timeout_s,
+        resync_period_s=settings.reconciler_resync_period_s,
+        watch_pods=settings.reconciler_watch_pods,
+        on_terminal=release_and_admit,
+        on_resync=_release_missing,
+    )
+    try:
+        reconciler.run()
+    except KeyboardInterrupt:
+        reconciler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Resource-aware admission between the Celery queue and Job creation.
+
+Jobs are sized from their TrainingConfig and wait in a pending set until
+the configured pool has room for every pod of the job at once (gang
+admission). Among waiting jobs the highest priority goes first; within a
+priority the owner (user/team) with the smallest weighted dominant share
+of the pool goes first, then the oldest job. Lower-priority jobs may
+backfill around a job that does not fit, until that job has waited
+scheduler_backfill_wait_s.
+
+State lives in Redis so every worker and the reconciler see the same
+reservations; admission passes are serialized with a Redis lock. A
+reservation is only proof of a launch once the executor has confirmed it
+(mark_launched). Reservations still unconfirmed after
+scheduler_launch_timeout_s (the worker died between admission and launch)
+go back to pending at their original place in the queue.
+
+The local executor's pool is whatever the local agent publishes
+(LOCAL_CAPACITY_KEY, refreshed while it runs), not the resources of the
+Celery worker's host; while no agent is running nothing is admitted.
+"""
+
+import logging
+import math
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from orchestrator.app.celery_app import settings
+from orchestrator.app.status import get_redis
+from shared import codec
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "ml_train:sched:pending"
+RESERVATIONS_KEY = "ml_train:sched:reservations"
+STATS_KEY = "ml_train:sched:stats"
+LOCK_KEY = "ml_train:sched:lock"
+LOCAL_CAPACITY_KEY = "ml_train:local:capacity"
+# Queue wait histogram (non-cumulative bucket counts + sum), exported by orchestrator.app.metrics
+QUEUE_WAIT_KEY = "ml_train:sched:queue_wait"
+QUEUE_WAIT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0, 21600.0)
+
+
+@dataclass(frozen=True)
+class ResourceRequest:
+    """Per-pod requests and the number of pods that must start together."""
+    cpu: float
+    memory_mi: int
+    pods: int = 1
+
+    @property
+    def total_cpu(self) -> float:
+        return self.cpu * self.pods
+
+    @property
+    def total_memory_mi(self) -> int:
+        return self.memory_mi * self.pods
+
+    def k8s_resources(self) -> dict[str, dict[str, str]]:
+        ratio = settings.scheduler_limit_ratio
+        return {
+            "requests": {"cpu": f"{self.cpu:g}", "memory": f"{self.memory_mi}Mi"},
+            "limits": {"cpu": f"{self.cpu * ratio:g}", "memory": f"{int(self.memory_mi * ratio)}Mi"},
+        }
+
+
+@dataclass(frozen=True)
+class Capacity:
+    cpu: float
+    memory_mi: int
+
+
+def size_request(training_config: dict[str, Any]) -> ResourceRequest:
+    """Size a job from its world_size, nodes and batch_size: one pod per node, ranks split evenly."""
+    nodes = max(int(training_config.get("nodes", 1)), 1)
+    ranks = max(int(training_config.get("world_size", 1)) // nodes, 1)
+    batch_size = max(int(training_config.get("batch_size", 32)), 1)
+    memory = settings.memory_base_mi + ranks * (
+        settings.memory_per_rank_mi + batch_size * settings.memory_per_sample_mi
+    )
+    return ResourceRequest(cpu=settings.cpu_per_rank * ranks, memory_mi=int(memory), pods=nodes)
+
+
+def local_cores() -> list[int]:
+    """Core ids the local executor may hand out (respects the process's cpuset)."""
+    cores = sorted(os.sched_getaffinity(0))
+    return cores[: settings.local_cpus] if settings.local_cpus else cores
+
+
+def local_memory_mi() -> int:
+    if settings.local_memory_mi:
+        return settings.local_memory_mi
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                total_mi = int(line.split()[1]) // 1024
+                return max(total_mi - settings.local_memory_reserve_mi, 0)
+    raise RuntimeError("MemTotal missing from /proc/meminfo")
+
+
+def local_agent_capacity(redis_client=None) -> Capacity | None:
+    """What the running local agent can hand out, or None while no agent is publishing."""
+    raw = (redis_client or get_redis()).get(LOCAL_CAPACITY_KEY)
+    if raw is None:
+        return None
+    published = codec.loads(raw)
+    return Capacity(cpu=float(published["cpu"]), memory_mi=int(published["memory_mi"]))
+
+
+def pool_capacity(redis_client=None) -> Capacity | None:
+    """Capacity of the configured executor's pool (None: unknown yet, admit nothing)."""
+    backend = settings.executor_backend
+    if backend == "local":
+        return local_agent_capacity(redis_client)
+    if backend == "simulated":
+        # Nothing runs, so nothing should ever wait
+        return Capacity(cpu=float("inf"), memory_mi=float("inf"))
+    return Capacity(cpu=settings.pool_cpu, memory_mi=settings.pool_memory_mi)
+
+
+def _dominant_share(cpu: float, memory_mi: float, capacity: Capacity) -> float:
+    return max(cpu / capacity.cpu, memory_mi / capacity.memory_mi)
+
+
+def _finite(value: float) -> float | None:
+    """JSON has no infinity (orjson would write null silently); say "unbounded" explicitly."""
+    return None if math.isinf(value) else value
+
+
+def plan_admission(
+    pending: list[dict[str, Any]],
+    reservations: list[dict[str, Any]],
+    capacity: Capacity,
+    weights: dict[str, float] | None = None,
+    now: float | None = None,
+    backfill_wait_s: float = 600.0,
+) -> list[dict[str, Any]]:
+    """
+    Pure admission policy: return the pending entries to admit, in order.
+
+    Entries carry "job_id", "owner", "priority", "enqueued_at" and "request"
+    (a ResourceRequest as dict); reservations carry "owner", "cpu", "memory_mi".
+    """
+    weights = weights or {}
+    now = time.time() if now is None else now
+    free_cpu = capacity.cpu - sum(r["cpu"] for r in reservations)
+    free_mem = capacity.memory_mi - sum(r["memory_mi"] for r in reservations)
+    usage: dict[str, list[float]] = {}
+    for r in reservations:
+        u = usage.setdefault(r["owner"], [0.0, 0.0])
+        u[0] += r["cpu"]
+        u[1] += r["memory_mi"]
+
+    # Per-owner queues, best first: priority desc, then FIFO
+    queues: dict[str, list[dict[str, Any]]] = {}
+    for entry in sorted(pending, key=lambda e: (-e["priority"], e["enqueued_at"])):
+        queues.setdefault(entry["owner"], []).append(entry)
+
+    def share(owner: str) -> float:
+        cpu, mem = usage.get(owner, (0.0, 0.0))
+        return _dominant_share(cpu, mem, capacity) / weights.get(owner, 1.0)
+
+    admitted = []
+    while queues:
+        owner = min(queues, key=lambda o: (-queues[o][0]["priority"], share(o), queues[o][0]["enqueued_at"]))
+        entry = queues[owner][0]
+        req = ResourceRequest(**entry["request"])
+        if req.total_cpu <= free_cpu and req.total_memory_mi <= free_mem:
+            admitted.append(entry)
+            free_cpu -= req.total_cpu
+            free_mem -= req.total_memory_mi
+            u = usage.setdefault(owner, [0.0, 0.0])
+            u[0] += req.total_cpu
+            u[1] += req.total_memory_mi
+            queues[owner].pop(0)
+        elif now - entry["enqueued_at"] >= backfill_wait_s:
+            # Head-of-line job has waited long enough: hold the remaining capacity for it
+            break
+        else:
+            # Doesn't fit yet; let other owners backfill. This owner's later jobs wait behind it.
+            del queues[owner]
+            continue
+        if not queues[owner]:
+            del queues[owner]
+    return admitted
+
+
+class AdmissionScheduler:
+    """Redis-backed pending set and reservations for one resource pool."""
+
+    def __init__(self, redis_client=None, capacity: Capacity | None = None) -> None:
+        self._redis = redis_client
+        self._capacity = capacity
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    @property
+    def capacity(self) -> Capacity | None:
+        """The fixed capacity if given, else the pool's current one (may be None for the local pool)."""
+        return self._capacity or pool_capacity(self.redis)
+
+    def fits_pool(self, request: ResourceRequest, capacity: Capacity | None = None) -> bool:
+        """Whether the whole pool could ever hold the job (True while its capacity is unknown)."""
+        capacity = capacity or self.capacity
+        if capacity is None:
+            return True
+        return request.total_cpu <= capacity.cpu and request.total_memory_mi <= capacity.memory_mi
+
+    def enqueue(self, job_id: str, payload: dict[str, Any], request: ResourceRequest) -> None:
+        """Add a job to the pending set (idempotent for redelivered tasks)."""
+        if self.redis.hexists(RESERVATIONS_KEY, job_id):
+            # Redelivered after a crash: requeue it if the launch was never confirmed
+            self.requeue_unlaunched([job_id])
+            return
+        entry = {
+            "job_id": job_id,
+            "payload": payload,
+            "request": asdict(request),
+            "priority": int(payload.get("priority") or 0),
+            "owner": payload.get("owner") or "default",
+            "enqueued_at": time.time(),
+        }
+        self.redis.hsetnx(PENDING_KEY, job_id, codec.dumps(entry))
+
+    def admit(self) -> list[dict[str, Any]]:
+        """Run one admission pass. Returns admitted entries; the caller launches them."""
+        r = self.redis
+        with r.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            pending = [codec.loads(v) for v in r.hvals(PENDING_KEY)]
+            reservations = [codec.loads(v) for v in r.hvals(RESERVATIONS_KEY)]
+            capacity = self.capacity
+            if capacity is None:
+                if pending:
+                    logger.warning(f"{len(pending)} jobs waiting: no local agent is publishing its capacity")
+                self._write_stats(len(pending), reservations, [], capacity)
+                return []
+            now = time.time()
+            admitted = plan_admission(
+                pending,
+                reservations,
+                capacity,
+                weights=settings.scheduler_owner_weights,
+                now=now,
+                backfill_wait_s=settings.scheduler_backfill_wait_s,
+            )
+            if admitted:
+                pipe = r.pipeline()
+                for entry in admitted:
+                    req = ResourceRequest(**entry["request"])
+                    wait = now - entry["enqueued_at"]
+                    if "queue_wait_s" not in entry:  # Requeued after an unconfirmed launch: counted already
+                        bucket = next((str(b) for b in QUEUE_WAIT_BUCKETS if wait <= b), "+Inf")
+                        pipe.hincrby(QUEUE_WAIT_KEY, bucket, 1)
+                        pipe.hincrbyfloat(QUEUE_WAIT_KEY, "sum", wait)
+                    entry["queue_wait_s"] = wait
+                    pipe.hdel(PENDING_KEY, entry["job_id"])
+                    pipe.hset(RESERVATIONS_KEY, entry["job_id"], codec.dumps({
+                        "owner": entry["owner"],
+                        "cpu": req.total_cpu,
+                        "memory_mi": req.total_memory_mi,
+                        "admitted_at": now,
+                        "launched": False,
+                        "entry": entry,  # To requeue if the launch is never confirmed
+                    }))
+                pipe.execute()
+            self._write_stats(len(pending) - len(admitted), reservations, admitted, capacity)
+        return admitted
+
+    def mark_launched(self, job_id: str) -> bool:
+        """Record that the executor started the job. Returns False if the reservation is gone."""
+        with self.redis.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            raw = self.redis.hget(RESERVATIONS_KEY, job_id)
+            if raw is None:
+                return False
+            reservation = codec.loads(raw)
+            reservation["launched"] = True
+            reservation.pop("entry", None)
+            self.redis.hset(RESERVATIONS_KEY, job_id, codec.dumps(reservation))
+        return True
+
+    def requeue_unlaunched(self, job_ids: list[str] | None = None, timeout_s: float | None = None) -> list[str]:
+        """
+        Move reservations whose launch was never confirmed within timeout_s back
+        to pending (all reservations, or only job_ids). Returns the requeued ids.
+        """
+        timeout_s = settings.scheduler_launch_timeout_s if timeout_s is None else timeout_s
+        r = self.redis
+        requeued = []
+        with r.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            if job_ids is None:
+                items = r.hgetall(RESERVATIONS_KEY).items()
+            else:
+                items = [(j, v) for j, v in zip(job_ids, r.hmget(RESERVATIONS_KEY, job_ids)) if v is not None]
+            now = time.time()
+            pipe = r.pipeline()
+            for job_id, raw in items:
+                job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+                reservation = codec.loads(raw)
+                if reservation.get("launched", True) or now - reservation["admitted_at"] <= timeout_s:
+                    continue
+                pipe.hdel(RESERVATIONS_KEY, job_id)
+                pipe.hset(PENDING_KEY, job_id, codec.dumps(reservation["entry"]))
+                requeued.append(job_id)
+            if requeued:
+                pipe.execute()
+                logger.warning(f"Requeued {len(requeued)} admitted jobs that were never launched: {requeued[:10]}")
+        return requeued
+
+    def withdraw(self, job_id: str) -> bool:
+        """Drop a job that has not been admitted yet. Returns False if it was not pending."""
+        return bool(self.redis.hdel(PENDING_KEY, job_id))
+
+    def release(self, job_id: str) -> bool:
+        """Free a job's reservation (or drop it from pending). Returns True if anything was held."""
+        pipe = self.redis.pipeline()
+        pipe.hdel(RESERVATIONS_KEY, job_id)
+        pipe.hdel(PENDING_KEY, job_id)
+        return any(pipe.execute())
+
+    def release_missing(self, active_job_ids: set[str], grace_s: float = 120.0) -> list[str]:
+        """
+        Release launched reservations whose K8s Job no longer exists (e.g. deleted
+        while nobody watched). Unconfirmed launches are requeued instead.
+        """
+        self.requeue_unlaunched()
+        now = time.time()
+        stale = []
+        for job_id, value in self.redis.hgetall(RESERVATIONS_KEY).items():
+            reservation = codec.loads(value)
+            # Reservations from before the launched flag existed count as launched
+            if reservation.get("launched", True) and now - reservation["admitted_at"] > grace_s:
+                stale.append(job_id.decode() if isinstance(job_id, bytes) else job_id)
+        stale = [job_id for job_id in stale if job_id not in active_job_ids]
+        if stale:
+            self.redis.hdel(RESERVATIONS_KEY, *stale)
+            logger.warning(f"Released {len(stale)} reservations without a K8s Job: {stale[:10]}")
+        return stale
+
+    def snapshot(self) -> dict[str, Any]:
+        stats = self.redis.get(STATS_KEY)
+        return codec.loads(stats) if stats else {}
+
+    def _write_stats(
+        self, pending: int, reservations: list[dict], admitted: list[dict], capacity: Capacity | None
+    ) -> None:
+        """Capacity fields are null when unbounded (simulated) or unknown (no local agent)."""
+        cpu = sum(r["cpu"] for r in reservations) + sum(ResourceRequest(**e["request"]).total_cpu for e in admitted)
+        mem = sum(r["memory_mi"] for r in reservations) + sum(
+            ResourceRequest(**e["request"]).total_memory_mi for e in admitted
+        )
+        self.redis.set(STATS_KEY, codec.dumps({
+            "capacity_cpu": _finite(capacity.cpu) if capacity else None,
+            "capacity_memory_mi": _finite(capacity.memory_mi) if capacity else None,
+            "reserved_cpu": cpu,
+            "reserved_memory_mi": mem,
+            "utilization": _dominant_share(cpu, mem, capacity) if capacity else None,
+            "pending": pending,
+            "running": len(reservations) + len(admitted),
+            "updated_at": time.time(),
+        }))
+
+
+scheduler = AdmissionScheduler()
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(scheduler.snapshot(), indent=2))
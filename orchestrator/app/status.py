@@ -0,0 +1,80 @@
+"""Redis job status: real-time key, DB sync queue and cache invalidation events."""
+
+import time
+from typing import Any
+
+import redis
+
+from orchestrator.app.celery_app import settings
+from shared import codec
+
+JOB_PREFIX = "ml_train:job:"
+JOB_STATUS_PREFIX = "ml_train:job_status:"
+STATUS_UPDATES_KEY = "ml_train:job_status_updates"
+JOB_EVENTS_CHANNEL = "ml_train:job_events"
+
+TERMINAL_STATUSES = frozenset({"succeeded", "failed", "cancelled"})
+# Statuses only move forward; anything terminal is final.
+STATUS_RANK = {"queued": 0, "pending": 1, "running": 2, "succeeded": 3, "failed": 3, "cancelled": 3}
+
+_pool: redis.ConnectionPool | None = None
+
+
+def get_redis() -> redis.Redis:
+    """Redis client on a process-wide connection pool (redis-py resets it after fork)."""
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool.from_url(settings.redis_url)
+    return redis.Redis(connection_pool=_pool)
+
+
+def update_redis_status(job_id: str, status: str, **extra):
+    """Set real-time status, queue the transition for the backend's DB sync and signal caches."""
+    data = {"status": status, "updated_at": time.time(), **extra}
+    pipe = get_redis().pipeline()
+    pipe.setex(f"{JOB_STATUS_PREFIX}{job_id}", 86400, codec.dumps(data))
+    pipe.rpush(STATUS_UPDATES_KEY, codec.dumps({"job_id": job_id, **data}))
+    pipe.publish(JOB_EVENTS_CHANNEL, codec.dumps({"job_id": job_id, "source": "status"}))
+    pipe.execute()
+
+
+def advance_redis_status(job_id: str, status: str, **extra) -> bool:
+    """
+    update_redis_status, but only if it moves the job forward (see STATUS_RANK).
+    For writers that may race the reconciler or replay after a redelivery.
+    """
+    key = f"{JOB_STATUS_PREFIX}{job_id}"
+    with get_redis().pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                raw = pipe.get(key)
+                current = codec.loads(raw).get("status") if raw else None
+                if current is not None and STATUS_RANK.get(current, 0) >= STATUS_RANK.get(status, 0):
+                    pipe.unwatch()
+                    return False
+                data = {"status": status, "updated_at": time.time(), **extra}
+                pipe.multi()
+                pipe.setex(key, 86400, codec.dumps(data))
+                pipe.rpush(STATUS_UPDATES_KEY, codec.dumps({"job_id": job_id, **data}))
+                pipe.publish(JOB_EVENTS_CHANNEL, codec.dumps({"job_id": job_id, "source": "status"}))
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                continue
+
+
+def get_job_statuses(job_ids: list[str]) -> dict[str, str | None]:
+    """Current status per job in one MGET (None if the key is missing or expired)."""
+    if not job_ids:
+        return {}
+    values = get_redis().mget([f"{JOB_STATUS_PREFIX}{job_id}" for job_id in job_ids])
+    return {
+        job_id: codec.loads(value).get("status") if value else None
+        for job_id, value in zip(job_ids, values)
+    }
+
+
+def get_job_payload(job_id: str) -> dict[str, Any] | None:
+    data = get_redis().get(f"{JOB_PREFIX}{job_id}")
+    return codec.loads(data) if data else None
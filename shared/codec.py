@@ -0,0 +1,127 @@
+"""
+Wire codec for Redis payloads and API responses.
+
+JSON goes through orjson (or msgspec) when installed, falling back to the
+stdlib. Metric points may also be sent as compact msgpack. Binary messages
+carry a 5-byte header (MAGIC, version, format) so producers and consumers
+can be upgraded independently: unframed JSON is always accepted as the
+legacy format, and an unknown version or format fails loudly.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional fast path
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional fast path
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional binary encoding
+    msgpack = None
+
+MAGIC = b"\x00MT"
+VERSION = 1
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+ENCODINGS = {"json": FORMAT_JSON, "msgpack": FORMAT_MSGPACK}
+_HEADER_LEN = len(MAGIC) + 2
+
+
+class CodecError(ValueError):
+    """Payload could not be encoded or decoded (every JSON backend's decode errors included)."""
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact JSON bytes."""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data: bytes | str) -> Any:
+        """Parse JSON from bytes or str."""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise CodecError(str(e)) from e
+
+elif msgspec is not None:
+    JSON_BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact JSON bytes."""
+        return _encoder.encode(obj)
+
+    def loads(data: bytes | str) -> Any:
+        """Parse JSON from bytes or str."""
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:  # Not a ValueError
+            raise CodecError(str(e)) from e
+
+else:
+    JSON_BACKEND = "json"
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact JSON bytes."""
+        return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+    def loads(data: bytes | str) -> Any:
+        """Parse JSON from bytes or str."""
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise CodecError(str(e)) from e
+
+
+def encode_message(obj: Any, encoding: str = "json") -> bytes:
+    """
+    Encode a message for Redis. "json" emits plain JSON, readable by every
+    consumer; "msgpack" emits a framed binary message.
+    """
+    fmt = ENCODINGS.get(encoding)
+    if fmt is None:
+        raise CodecError(f"Unknown encoding {encoding!r}; expected one of {sorted(ENCODINGS)}")
+    if fmt == FORMAT_JSON:
+        return dumps(obj)
+    if msgpack is None:
+        raise CodecError("msgpack encoding requested but msgpack is not installed")
+    return MAGIC + bytes((VERSION, fmt)) + msgpack.packb(obj, use_bin_type=True)
+
+
+def decode_message(data: bytes | str) -> Any:
+    """Decode a message produced by encode_message (or legacy plain JSON)."""
+    if isinstance(data, str) or not data.startswith(MAGIC):
+        return loads(data)
+    if len(data) < _HEADER_LEN:
+        raise CodecError("Truncated message header")
+    version, fmt = data[len(MAGIC)], data[len(MAGIC) + 1]
+    if version > VERSION:
+        raise CodecError(f"Message version {version} is newer than supported version {VERSION}")
+    body = data[_HEADER_LEN:]
+    if fmt == FORMAT_JSON:
+        return loads(body)
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise CodecError("Received msgpack message but msgpack is not installed")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise CodecError(f"Malformed msgpack message: {e}") from e
+    raise CodecError(f"Unknown message format {fmt}")
@@ -1,17 +1,21 @@
 """Shared Pydantic schemas for job configs across backend, orchestrator, trainer."""
 
 from .job import (
+    JobBatchSubmitRequest,
     JobSubmitRequest,
     JobSubmitResponse,
     JobStatus,
     TrainingConfig,
     ModelConfig,
 )
+from .sweep import SweepCreateRequest
 
 __all__ = [
+    "JobBatchSubmitRequest",
     "JobSubmitRequest",
     "JobSubmitResponse", 
     "JobStatus",
     "TrainingConfig",
     "ModelConfig",
+    "SweepCreateRequest",
 ]
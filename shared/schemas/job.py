@@ -2,7 +2,7 @@
 
 from enum import Enum
 from typing import Any, Optional
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 
 
 class JobStatus(str, Enum):
@@ -28,10 +28,17 @@ class TrainingConfig(BaseModel):
     batch_size: int = 32
     learning_rate: float = 0.001
     weight_decay: float = 0.0001
-    world_size: int = Field(default=1, ge=1, le=8, description="Simulated GPU workers")
+    world_size: int = Field(default=1, ge=1, le=64, description="DDP ranks (processes) across all nodes")
+    nodes: int = Field(default=1, ge=1, le=16, description="Pods/hosts the ranks are split evenly across")
     dataset: str = "cifar10"
     extra: dict[str, Any] = Field(default_factory=dict)
 
+    @model_validator(mode="after")
+    def _ranks_per_node(self) -> "TrainingConfig":
+        if self.world_size % self.nodes:
+            raise ValueError(f"world_size={self.world_size} must be a multiple of nodes={self.nodes}")
+        return self
+
 
 class JobSubmitRequest(BaseModel):
     """Request body for submitting a training job."""
@@ -39,11 +46,58 @@ class JobSubmitRequest(BaseModel):
     architecture_config: ModelConfig = Field(default_factory=ModelConfig, alias="model_config")
     training_config: TrainingConfig = Field(default_factory=TrainingConfig)
     name: Optional[str] = None
+    priority: int = Field(default=0, description="Higher is admitted first")
+    owner: Optional[str] = Field(default=None, description="User or team, for fair-share admission")
+    seed: Optional[int] = Field(default=None, description="Random seed; part of the result memoization key")
+    code_version: Optional[str] = Field(
+        default=None, description="Trainer code version; defaults to the deployment's TRAINER_CODE_VERSION"
+    )
+    reuse_results: bool = Field(
+        default=True, description="Reuse a succeeded or attach to a running job with an identical config"
+    )
     model_config = ConfigDict(populate_by_name=True)
 
 
+def check_grid_paths(base: JobSubmitRequest, grid: dict[str, list[Any]]) -> None:
+    """Raise ValueError unless every dotted grid path can be set on base's config."""
+    config = base.model_dump(by_alias=True)
+    for path in grid:
+        *parents, leaf = path.split(".")
+        if not leaf or not all(parents):
+            raise ValueError(f"grid path {path!r} has an empty segment")
+        target: Any = config
+        for part in parents:
+            target = target.get(part, {})
+            if not isinstance(target, dict):
+                raise ValueError(f"grid path {path!r} goes through {part!r}, which is not an object")
+
+
+class JobBatchSubmitRequest(BaseModel):
+    """Request body for submitting many jobs at once (e.g. a sweep).
+
+    List job configs in `jobs` and/or give a `base` config plus a `grid`
+    mapping dotted paths (e.g. "training_config.learning_rate") to values;
+    a grid without a base is rejected.
+    Items are validated individually so one bad config does not reject the batch.
+    """
+    jobs: list[dict[str, Any]] = Field(default_factory=list)
+    base: Optional[JobSubmitRequest] = None
+    grid: dict[str, list[Any]] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def _grid_paths(self) -> "JobBatchSubmitRequest":
+        if self.grid:
+            if self.base is None:
+                raise ValueError("grid requires a base config")
+            check_grid_paths(self.base, self.grid)
+        return self
+
+
 class JobSubmitResponse(BaseModel):
     """Response after job submission."""
     job_id: str
     status: JobStatus = JobStatus.QUEUED
     message: str = "Job queued successfully"
+    memoized: Optional[str] = Field(
+        default=None, description='"hit" (identical job already succeeded) or "attached" (still running)'
+    )
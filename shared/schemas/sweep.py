@@ -0,0 +1,32 @@
+"""Hyperparameter sweep schemas."""
+
+from typing import Any, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+from .job import JobSubmitRequest, check_grid_paths
+
+
+class SweepCreateRequest(BaseModel):
+    """Request body for starting a sweep with ASHA early stopping.
+
+    Trials are the `grid` expansion of `base` (dotted paths, as for batch
+    submits). Each trial runs up to base.training_config.epochs; at rungs
+    min_epochs * reduction_factor**k, trials outside the top 1/reduction_factor
+    of those that reached the rung are cancelled and their capacity handed to
+    the next trials.
+    """
+    name: Optional[str] = None
+    base: JobSubmitRequest = Field(default_factory=JobSubmitRequest)
+    grid: dict[str, list[Any]] = Field(default_factory=dict)
+    metric: Literal["loss", "accuracy"] = "loss"
+    mode: Optional[Literal["min", "max"]] = Field(
+        default=None, description="Defaults to min for loss, max for accuracy"
+    )
+    max_concurrent: int = Field(default=4, ge=1, le=256)
+    min_epochs: int = Field(default=1, ge=1, description="First rung (ASHA grace period)")
+    reduction_factor: int = Field(default=3, ge=2)
+
+    @model_validator(mode="after")
+    def _grid_paths(self) -> "SweepCreateRequest":
+        check_grid_paths(self.base, self.grid)
+        return self
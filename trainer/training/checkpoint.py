@@ -0,0 +1,91 @@
+"""
+Training checkpoints, so a restarted trainer (K8s Job retry, torchrun
+restart after a failed rank) resumes instead of starting over.
+
+With CHECKPOINT_DIR set, rank 0 writes <CHECKPOINT_DIR>/<job_id>.pt every
+CHECKPOINT_EVERY_STEPS optimizer steps and at the end of every epoch:
+model and optimizer state, the epoch and, for datasets that support it
+(shards.ShardedIterableDataset), the dataset position, so a resume
+mid-epoch yields exactly the batches not yet trained on. Other datasets
+resume at the start of the interrupted epoch. Every rank loads the same
+file; DDP keeps their states identical.
+
+CHECKPOINT_DIR must outlive the pod (e.g. a ReadWriteMany volume).
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", "")
+CHECKPOINT_EVERY_STEPS = int(os.environ.get("CHECKPOINT_EVERY_STEPS", "500"))
+
+
+def checkpoint_path(job_id: str) -> Path | None:
+    return Path(CHECKPOINT_DIR) / f"{job_id}.pt" if CHECKPOINT_DIR else None
+
+
+def resumable(dataset: Any) -> bool:
+    """Whether the dataset can record and restore a mid-epoch position."""
+    return hasattr(dataset, "state_dict") and hasattr(dataset, "load_state_dict")
+
+
+def save(
+    job_id: str,
+    model: nn.Module,
+    optimizer: torch.optim.Optimizer,
+    epoch: int,
+    batches_done: int,
+    global_step: int,
+    dataset: Any = None,
+) -> None:
+    """Record that batches_done batches of `epoch` have been trained (atomically replaces the last checkpoint)."""
+    path = checkpoint_path(job_id)
+    if path is None:
+        return
+    if batches_done and not resumable(dataset):
+        return  # the position inside this epoch could not be restored
+    state = {
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "epoch": epoch,
+        "batches_done": batches_done,
+        "global_step": global_step,
+    }
+    if batches_done:
+        state["dataset"] = dataset.state_dict(batches_done)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".pt.tmp")
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+def restore(
+    job_id: str,
+    model: nn.Module,
+    optimizer: torch.optim.Optimizer,
+    device: torch.device,
+    dataset: Any = None,
+) -> tuple[int, int, int]:
+    """
+    Load the job's checkpoint into model, optimizer and dataset.
+    Returns (epoch, batches_done, global_step) to continue from; zeros without a checkpoint.
+    """
+    path = checkpoint_path(job_id)
+    if path is None or not path.exists():
+        return 0, 0, 0
+    state = torch.load(path, map_location=device)
+    model.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    batches_done = 0
+    if "dataset" in state and resumable(dataset):
+        dataset.load_state_dict(state["dataset"])
+        batches_done = state["batches_done"]
+    logger.info(f"Resuming from {path}: epoch {state['epoch']}, {batches_done} batches done")
+    return state["epoch"], batches_done, state["global_step"]
@@ -0,0 +1,278 @@
+"""
+Node-local dataset cache shared by every trainer process on a node.
+
+Archives are fetched once (from DATASET_MIRROR if set, else the upstream
+URL), verified against the known checksum and unpacked into a
+content-addressed directory named after the archive's sha256:
+
+    <DATASET_CACHE_DIR>/
+        refs/<name>            sha256 of the entry serving <name>
+        objects/<sha256>/      unpacked dataset, ready once .complete exists
+        locks/                 flock files
+        tmp/                   partial downloads and unpacks
+
+One process per node fetches a dataset while the others block on its
+lock. Readers hold a shared lock on their entry for the life of the
+process, and least recently used entries that nobody holds are evicted
+once the cache exceeds DATASET_CACHE_MAX_GB. With DATASET_OFFLINE=1 the
+network is never used.
+
+    python -m training.dataset_cache prefetch cifar10
+    python -m training.dataset_cache list
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", "/var/cache/ml-train/datasets")
+MIRROR_DIR = os.environ.get("DATASET_MIRROR", "")
+OFFLINE = os.environ.get("DATASET_OFFLINE", "").lower() in ("1", "true", "yes")
+MAX_BYTES = int(float(os.environ.get("DATASET_CACHE_MAX_GB", "50")) * 1024**3)
+COMPLETE_MARKER = ".complete"
+CHUNK = 1024 * 1024
+
+
+class DatasetCacheError(RuntimeError):
+    """Dataset could not be fetched, verified or unpacked."""
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    name: str
+    filename: str
+    url: str
+    md5: str
+
+
+DATASETS = {
+    "cifar10": DatasetSpec(
+        name="cifar10",
+        filename="cifar-10-python.tar.gz",
+        url="https://www.cs.toronto.edu/~kriz/cifar-10-python.tar.gz",
+        md5="c58f30108f718f92721af3b95e74349a",
+    ),
+}
+
+# Shared locks on entries in use by this process, held until exit
+_held: dict[str, IO] = {}
+
+
+@contextmanager
+def _flock(path: Path, mode: int) -> Iterator[IO]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class DatasetCache:
+    def __init__(
+        self,
+        root: str | Path = CACHE_DIR,
+        mirror: str | Path | None = MIRROR_DIR or None,
+        offline: bool = OFFLINE,
+        max_bytes: int = MAX_BYTES,
+    ) -> None:
+        self.root = Path(root)
+        self.mirror = Path(mirror) if mirror else None
+        self.offline = offline
+        self.max_bytes = max_bytes
+
+    def _ref(self, name: str) -> Path:
+        return self.root / "refs" / name
+
+    def _object(self, digest: str) -> Path:
+        return self.root / "objects" / digest
+
+    def _lock(self, name: str) -> Path:
+        return self.root / "locks" / f"{name}.lock"
+
+    def _ready(self, name: str) -> Path | None:
+        """The entry serving name, if it is complete."""
+        try:
+            digest = self._ref(name).read_text().strip()
+        except FileNotFoundError:
+            return None
+        path = self._object(digest)
+        return path if (path / COMPLETE_MARKER).exists() else None
+
+    def ensure(self, name: str) -> Path:
+        """Directory holding the unpacked dataset, fetching it first if needed."""
+        spec = DATASETS.get(name)
+        if spec is None:
+            raise DatasetCacheError(f"Unknown dataset {name!r}; expected one of {sorted(DATASETS)}")
+        while True:
+            path = self._ready(name)
+            if path is None:
+                with _flock(self._lock(name), fcntl.LOCK_EX):
+                    # Whoever held the lock before us may have fetched it already
+                    path = self._ready(name) or self._fetch(spec)
+            if self._hold(path):
+                break
+        self.evict()
+        return path
+
+    def _hold(self, path: Path) -> bool:
+        """
+        Mark the entry in use (shared lock) and recently used (marker mtime).
+        Returns False if it was evicted before we got the lock.
+        """
+        digest = path.name
+        if digest not in _held:
+            f = open(self._lock(f"object-{digest}"), "a+")
+            fcntl.flock(f, fcntl.LOCK_SH)
+            if not (path / COMPLETE_MARKER).exists():
+                f.close()
+                return False
+            _held[digest] = f
+        os.utime(path / COMPLETE_MARKER)
+        return True
+
+    def _fetch(self, spec: DatasetSpec) -> Path:
+        tmp = self.root / "tmp"
+        tmp.mkdir(parents=True, exist_ok=True)
+        archive = tmp / f"{spec.filename}.{os.getpid()}"
+        try:
+            sha256, md5 = self._download(spec, archive)
+            if md5 != spec.md5:
+                raise DatasetCacheError(f"{spec.filename}: md5 {md5} does not match expected {spec.md5}")
+            path = self._object(sha256)
+            if not (path / COMPLETE_MARKER).exists():
+                self._unpack(spec, archive, path)
+        finally:
+            archive.unlink(missing_ok=True)
+        ref = self._ref(spec.name)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        ref_tmp = tmp / f"ref-{spec.name}.{os.getpid()}"
+        ref_tmp.write_text(sha256)
+        os.replace(ref_tmp, ref)
+        logger.info(f"Cached {spec.name} at {path}")
+        return path
+
+    def _download(self, spec: DatasetSpec, dest: Path) -> tuple[str, str]:
+        """Copy the archive from the mirror or URL to dest; returns (sha256, md5)."""
+        mirrored = self.mirror / spec.filename if self.mirror else None
+        if mirrored is not None and mirrored.exists():
+            logger.info(f"Fetching {spec.name} from mirror {mirrored}")
+            source = open(mirrored, "rb")
+        elif self.offline:
+            raise DatasetCacheError(
+                f"{spec.name} is not cached and {spec.filename} is not in the mirror ({self.mirror}); offline mode"
+            )
+        else:
+            logger.info(f"Downloading {spec.name} from {spec.url}")
+            source = urllib.request.urlopen(spec.url, timeout=60)
+        sha256, md5 = hashlib.sha256(), hashlib.md5()
+        with source, open(dest, "wb") as out:
+            while chunk := source.read(CHUNK):
+                sha256.update(chunk)
+                md5.update(chunk)
+                out.write(chunk)
+        return sha256.hexdigest(), md5.hexdigest()
+
+    def _unpack(self, spec: DatasetSpec, archive: Path, path: Path) -> None:
+        staging = self.root / "tmp" / f"{path.name}.{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            with tarfile.open(archive) as tar:
+                tar.extractall(staging, filter="data")
+            (staging / COMPLETE_MARKER).write_text(json.dumps({
+                "name": spec.name,
+                "size": _dir_size(staging),
+                "created_at": time.time(),
+            }))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.rmtree(path, ignore_errors=True)  # Leftover without a marker
+            os.rename(staging, path)
+        except (OSError, tarfile.TarError) as e:
+            raise DatasetCacheError(f"Failed to unpack {spec.filename}: {e}") from e
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def entries(self) -> list[dict]:
+        """Complete entries, least recently used first."""
+        objects = self.root / "objects"
+        result = []
+        for path in objects.iterdir() if objects.exists() else []:
+            marker = path / COMPLETE_MARKER
+            try:
+                info = json.loads(marker.read_text())
+                used = marker.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            result.append({"digest": path.name, "path": str(path), "last_used": used, **info})
+        return sorted(result, key=lambda e: e["last_used"])
+
+    def evict(self) -> list[str]:
+        """Delete least recently used entries nobody holds until the cache fits the budget."""
+        evicted = []
+        with _flock(self.root / "locks" / "evict.lock", fcntl.LOCK_EX):
+            entries = self.entries()
+            total = sum(e["size"] for e in entries)
+            for entry in entries:
+                if total <= self.max_bytes:
+                    break
+                with open(self._lock(f"object-{entry['digest']}"), "a+") as f:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # In use by a running job
+                    path = Path(entry["path"])
+                    # Drop the marker first so readers never see a half-deleted entry as ready
+                    (path / COMPLETE_MARKER).unlink(missing_ok=True)
+                    shutil.rmtree(path, ignore_errors=True)
+                    total -= entry["size"]
+                    evicted.append(entry["digest"])
+                    logger.info(f"Evicted {entry['name']} ({entry['size']} bytes)")
+        return evicted
+
+
+def ensure_dataset(name: str) -> Path:
+    """Unpacked dataset directory from the node cache (see module docstring)."""
+    return DatasetCache().ensure(name)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Node-local dataset cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prefetch = sub.add_parser("prefetch", help="Fetch datasets into the cache")
+    prefetch.add_argument("names", nargs="+", choices=sorted(DATASETS))
+    sub.add_parser("list", help="Show cached entries, least recently used first")
+    sub.add_parser("evict", help="Evict entries over the size budget")
+    args = parser.parse_args()
+
+    cache = DatasetCache()
+    if args.command == "prefetch":
+        for name in args.names:
+            print(cache.ensure(name))
+    elif args.command == "list":
+        for entry in cache.entries():
+            print(f"{entry['name']:<12} {entry['size'] / 1024**2:>10.1f}Mi  {entry['digest'][:12]}  {entry['path']}")
+    else:
+        print("\n".join(cache.evict()))
+
+
+if __name__ == "__main__":
+    main()
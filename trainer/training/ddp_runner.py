@@ -1,7 +1,9 @@
 """
-Simulated multi-GPU / distributed training via PyTorch DDP.
+Multi-GPU / distributed training via PyTorch DDP.
 Run with: torchrun --nproc_per_node=N -m training.ddp_runner --job-id X --config '{}'
 Or locally: python -m training.ddp_runner --job-id X --config '{}' --world-size 2
+Multi-node jobs start through training.launch, which runs torchrun on every node;
+ranks then come from the environment torchrun sets up.
 """
 
 import argparse
@@ -13,7 +15,9 @@ import torch
 import torch.distributed as dist
 from torch.nn.parallel import DistributedDataParallel as DDP
 
-from .main import get_model, publish_metrics, REDIS_URL
+from . import checkpoint
+from .main import get_dataloaders, get_model, load_train_dataset, publish_metrics, REDIS_URL
+from .shards import is_sharded
 import redis
 
 logging.basicConfig(level=logging.INFO)
@@ -26,12 +30,20 @@ def setup(rank: int, world_size: int):
     dist.init_process_group("gloo", rank=rank, world_size=world_size)
 
 
+def env_rank() -> tuple[int, int, int] | None:
+    """(rank, world_size, local_rank) when started by torchrun, else None."""
+    if "RANK" not in os.environ or "WORLD_SIZE" not in os.environ:
+        return None
+    return int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"]), int(os.environ.get("LOCAL_RANK", "0"))
+
+
 def cleanup():
     dist.destroy_process_group()
 
 
-def run_worker(rank: int, world_size: int, job_id: str, config: dict):
+def run_worker(rank: int, world_size: int, job_id: str, config: dict, local_rank: int | None = None):
     setup(rank, world_size)
+    local_rank = rank if local_rank is None else local_rank
 
     import torch.nn as nn
     from torch.utils.data.distributed import DistributedSampler
@@ -45,28 +57,42 @@ def run_worker(rank: int, world_size: int, job_id: str, config: dict):
     lr = train_cfg.get("learning_rate", 0.001)
     dataset = train_cfg.get("dataset", "cifar10")
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if config.get("seed") is not None:
+        torch.manual_seed(config["seed"])
+    if torch.cuda.is_available():
+        device = torch.device("cuda", local_rank % torch.cuda.device_count())
+        torch.cuda.set_device(device)
+    else:
+        device = torch.device("cpu")
     model = get_model(architecture, num_classes).to(device)
     model = DDP(model)
     criterion = nn.CrossEntropyLoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=lr)
 
-    from torchvision import datasets, transforms
-    transform = transforms.Compose([
-        transforms.ToTensor(),
-        transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5)),
-    ])
-    train_ds = datasets.CIFAR10(root="/tmp/data", train=True, download=True, transform=transform)
-    sampler = DistributedSampler(train_ds, num_replicas=world_size, rank=rank)
-    loader = torch.utils.data.DataLoader(train_ds, batch_size=batch_size, sampler=sampler, num_workers=0)
+    if is_sharded(dataset):
+        # Shards are split across ranks by the dataset itself, with equal batch counts per rank
+        loader = get_dataloaders(dataset, batch_size, world_size, rank, seed=config.get("seed"))
+        sampler = loader.dataset
+    else:
+        from torchvision import transforms
+        transform = transforms.Compose([
+            transforms.ToTensor(),
+            transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5)),
+        ])
+        train_ds = load_train_dataset(dataset, transform)
+        sampler = DistributedSampler(train_ds, num_replicas=world_size, rank=rank)
+        loader = torch.utils.data.DataLoader(train_ds, batch_size=batch_size, sampler=sampler, num_workers=0)
 
     r = redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
-    global_step = 0
+    # Every rank restores the same checkpoint (only rank 0 writes it); sharded datasets resume mid-epoch
+    start_epoch, batches_done, global_step = checkpoint.restore(job_id, model, optimizer, device, sampler)
 
-    for epoch in range(epochs):
+    for epoch in range(start_epoch, epochs):
         sampler.set_epoch(epoch)
         model.train()
         total_loss, correct, total = 0.0, 0, 0
+        step = batches_done if epoch == start_epoch else 0
+        batches = 0  # counted, not len(loader): a resumed epoch yields fewer
         for batch_idx, (data, target) in enumerate(loader):
             data, target = data.to(device), target.to(device)
             optimizer.zero_grad()
@@ -79,13 +105,24 @@ def run_worker(rank: int, world_size: int, job_id: str, config: dict):
             correct += pred.eq(target).sum().item()
             total += target.size(0)
             global_step += 1
+            step += 1
+            batches += 1
             if rank == 0 and r and batch_idx % 10 == 0:
                 publish_metrics(r, job_id, global_step, float(epoch), {
-                    "loss": total_loss / (batch_idx + 1),
+                    "loss": total_loss / batches,
                     "accuracy": correct / total,
                 })
+            if rank == 0 and step % checkpoint.CHECKPOINT_EVERY_STEPS == 0:
+                checkpoint.save(job_id, model, optimizer, epoch, step, global_step, sampler)
         if rank == 0:
-            logger.info(f"Epoch {epoch+1}/{epochs} rank={rank} loss={total_loss/len(loader):.4f} acc={correct/total:.4f}")
+            loss = total_loss / max(batches, 1)
+            logger.info(f"Epoch {epoch+1}/{epochs} rank={rank} loss={loss:.4f} acc={correct/max(total, 1):.4f}")
+            checkpoint.save(job_id, model, optimizer, epoch + 1, 0, global_step)
+            if r:
+                publish_metrics(r, job_id, global_step, float(epoch + 1), {
+                    "loss": loss,
+                    "accuracy": correct / max(total, 1),
+                }, epoch_end=True)
 
     cleanup()
     if r:
@@ -110,6 +147,12 @@ def main():
     args = parser.parse_args()
 
     config = json.loads(args.config)
+    launched = env_rank()
+    if launched is not None:
+        rank, world_size, local_rank = launched
+        run_worker(rank, world_size, args.job_id, config, local_rank)
+        return
+
     world_size = args.world_size or config.get("training_config", {}).get("world_size", 1)
 
     if world_size <= 1:
@@ -0,0 +1,113 @@
+"""
+Multi-node launcher using torchrun's elastic c10d rendezvous.
+
+Each node (one pod of an Indexed K8s Job) runs
+
+    python -m training.launch --job-id X --config '{...}'
+
+which execs torch.distributed.run with world_size / nodes local ranks. The
+nodes meet at RDZV_ENDPOINT (the index-0 pod, through the job's headless
+Service). torchrun assigns ranks and sets RANK, WORLD_SIZE, LOCAL_RANK,
+MASTER_ADDR and MASTER_PORT, which training.ddp_runner picks up.
+
+--local runs every node as a subprocess of this host, with the rendezvous
+on 127.0.0.1. It exercises the same path without a cluster:
+
+    python -m training.launch --local --job-id test --config '{"training_config": {"world_size": 4, "nodes": 2}}'
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RESTARTS = int(os.environ.get("DDP_MAX_RESTARTS", "0"))
+
+
+def node_command(config: dict[str, Any], job_id: str, endpoint: str, max_restarts: int = 0) -> list[str]:
+    """torchrun invocation for one node of the job."""
+    train_cfg = config.get("training_config", {})
+    nodes = max(int(train_cfg.get("nodes", 1)), 1)
+    nproc_per_node = max(int(train_cfg.get("world_size", 1)) // nodes, 1)
+    return [
+        sys.executable, "-m", "torch.distributed.run",
+        f"--nnodes={nodes}",
+        f"--nproc_per_node={nproc_per_node}",
+        "--rdzv_backend=c10d",
+        f"--rdzv_endpoint={endpoint}",
+        f"--rdzv_id={job_id}",
+        f"--max_restarts={max_restarts}",
+        "-m", "training.ddp_runner",
+        "--job-id", job_id,
+        "--config", json.dumps(config),
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_local_nodes(config: dict[str, Any], job_id: str, max_restarts: int = 0) -> int:
+    """Run all of the job's nodes on this host; returns the first non-zero exit code, else 0."""
+    nodes = max(int(config.get("training_config", {}).get("nodes", 1)), 1)
+    endpoint = f"127.0.0.1:{_free_port()}"
+    command = node_command(config, job_id, endpoint, max_restarts)
+    logger.info(f"Starting {nodes} local nodes, rendezvous at {endpoint}")
+    procs = [subprocess.Popen(command) for _ in range(nodes)]
+
+    def _terminate(*_):
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, lambda *_: (_terminate(), sys.exit(143)))
+    try:
+        while True:
+            codes = [p.poll() for p in procs]
+            failed = [c for c in codes if c not in (None, 0)]
+            if failed:
+                # One node down means the rendezvous can't complete; don't leave the rest waiting
+                logger.error(f"A node exited with {failed[0]}; stopping the others")
+                _terminate()
+                for p in procs:
+                    p.wait()
+                return failed[0]
+            if all(c == 0 for c in codes):
+                return 0
+            time.sleep(0.5)
+    finally:
+        _terminate()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Start one node (or all nodes locally) of a DDP job")
+    parser.add_argument("--job-id", required=True)
+    parser.add_argument("--config", required=True, help="JSON config")
+    parser.add_argument("--rdzv-endpoint", default=os.environ.get("RDZV_ENDPOINT"), help="host:port of the rendezvous")
+    parser.add_argument("--max-restarts", type=int, default=DEFAULT_MAX_RESTARTS)
+    parser.add_argument("--local", action="store_true", help="Run every node on this host")
+    args = parser.parse_args()
+
+    config = json.loads(args.config)
+    if args.local:
+        sys.exit(run_local_nodes(config, args.job_id, args.max_restarts))
+    if not args.rdzv_endpoint:
+        parser.error("--rdzv-endpoint or RDZV_ENDPOINT is required unless --local")
+    command = node_command(config, args.job_id, args.rdzv_endpoint, args.max_restarts)
+    # torchrun takes over this process so it receives the pod's signals directly
+    os.execv(command[0], command)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import argparse
 import json
 import logging
 import os
+import time
 from typing import Any
 
 import torch
@@ -16,6 +17,15 @@ from torch.utils.data import DataLoader
 from torchvision import datasets, models, transforms
 import redis
 
+from . import checkpoint
+from .dataset_cache import ensure_dataset
+from .shards import SHARD_PREFIX, ShardedIterableDataset, is_sharded
+
+try:
+    from shared import codec
+except ImportError:  # shared/ not on the path: publish legacy plain JSON
+    codec = None
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -24,6 +34,28 @@ logger = logging.getLogger(__name__)
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 METRICS_CHANNEL = "ml_train:metrics"
+METRICS_ENCODING = os.environ.get("METRICS_ENCODING", "json")
+
+
+def _metrics_encoding(requested: str) -> str:
+    """The encoding actually used: msgpack falls back to JSON (every consumer reads it) if unavailable."""
+    if requested == "json":
+        return requested
+    if codec is None:
+        logger.warning(f"METRICS_ENCODING={requested} needs shared.codec, which is not importable; publishing JSON")
+        return "json"
+    if requested not in codec.ENCODINGS:
+        logger.warning(f"Unknown METRICS_ENCODING={requested}; publishing JSON")
+        return "json"
+    if requested == "msgpack" and codec.msgpack is None:
+        logger.warning("METRICS_ENCODING=msgpack but msgpack is not installed; publishing JSON")
+        return "json"
+    return requested
+
+
+METRICS_ENCODING = _metrics_encoding(METRICS_ENCODING)
+DATALOADER_WORKERS = int(os.environ.get("DATALOADER_WORKERS", "2"))
+SHUFFLE_BUFFER = int(os.environ.get("SHUFFLE_BUFFER", "8192"))
 
 
 def get_model(architecture: str, num_classes: int) -> nn.Module:
@@ -39,15 +71,41 @@ def get_model(architecture: str, num_classes: int) -> nn.Module:
     return model
 
 
-def get_dataloaders(dataset: str, batch_size: int, world_size: int = 1, rank: int = 0):
+def load_train_dataset(dataset: str, transform):
+    """Training split from the node's shared dataset cache (only CIFAR-10 so far)."""
+    root = ensure_dataset("cifar10")
+    return datasets.CIFAR10(root=str(root), train=True, download=False, transform=transform)
+
+
+def get_dataloaders(dataset: str, batch_size: int, world_size: int = 1, rank: int = 0, seed: int | None = None):
+    """
+    Training loader for this rank. "shards:<dir>" streams a sharded dataset
+    (see shards.py); call loader.dataset.set_epoch(epoch) before each epoch.
+    """
     transform = transforms.Compose([
         transforms.ToTensor(),
         transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5)),
     ])
-    if dataset == "cifar10":
-        train_ds = datasets.CIFAR10(root="/tmp/data", train=True, download=True, transform=transform)
-    else:
-        train_ds = datasets.CIFAR10(root="/tmp/data", train=True, download=True, transform=transform)
+    if is_sharded(dataset):
+        stream = ShardedIterableDataset(
+            dataset[len(SHARD_PREFIX):],
+            transform=transform,
+            rank=rank,
+            world_size=world_size,
+            batch_size=batch_size,
+            shuffle_buffer=SHUFFLE_BUFFER,
+            seed=seed or 0,
+            num_workers=DATALOADER_WORKERS,
+        )
+        workers = DATALOADER_WORKERS
+        return DataLoader(
+            stream,
+            batch_size=batch_size,
+            num_workers=workers,
+            pin_memory=torch.cuda.is_available(),
+            prefetch_factor=4 if workers else None,
+        )
+    train_ds = load_train_dataset(dataset, transform)
     # Simple shard for multi-process simulation
     total = len(train_ds)
     per_worker = total // world_size
@@ -58,9 +116,23 @@ def get_dataloaders(dataset: str, batch_size: int, world_size: int = 1, rank: in
     return loader
 
 
-def publish_metrics(r: redis.Redis, job_id: str, step: int, epoch: float, metrics: dict[str, float]):
-    payload = {"job_id": job_id, "step": step, "epoch": epoch, **metrics}
-    r.publish(METRICS_CHANNEL, json.dumps(payload))
+def publish_metrics(
+    r: redis.Redis,
+    job_id: str,
+    step: int,
+    epoch: float,
+    metrics: dict[str, float],
+    epoch_end: bool = False,
+):
+    """Publish a metric point; epoch_end marks the summary after `epoch` full epochs (sweep rungs)."""
+    # ts lets the collector measure publish-to-insert lag
+    payload = {"job_id": job_id, "step": step, "epoch": epoch, "ts": time.time(), **metrics}
+    if epoch_end:
+        payload["epoch_end"] = True
+    if codec is not None:
+        r.publish(METRICS_CHANNEL, codec.encode_message(payload, METRICS_ENCODING))
+    else:
+        r.publish(METRICS_CHANNEL, json.dumps(payload))
 
 
 def train_one_epoch(
@@ -74,12 +146,15 @@ def train_one_epoch(
     redis_client: redis.Redis | None,
     world_size: int,
     rank: int,
+    batches_done: int = 0,
 ) -> dict[str, float]:
+    """One epoch; batches_done > 0 continues an epoch restored from a checkpoint."""
     model.train()
     total_loss = 0.0
     correct = 0
     total = 0
-    step = 0
+    step = batches_done  # batches of this epoch trained so far, including before a resume
+    batches = 0  # batches in this call: the divisor for averages
     for batch_idx, (data, target) in enumerate(loader):
         data, target = data.to(device), target.to(device)
         optimizer.zero_grad()
@@ -92,15 +167,18 @@ def train_one_epoch(
         correct += pred.eq(target).sum().item()
         total += target.size(0)
         step += 1
+        batches += 1
         if redis_client and step % 10 == 0:
-            avg_loss = total_loss / step
+            avg_loss = total_loss / batches
             acc = correct / total
             publish_metrics(redis_client, job_id, epoch * len(loader) + step, float(epoch), {
                 "loss": avg_loss,
                 "accuracy": acc,
             })
-    avg_loss = total_loss / max(step, 1)
-    acc = correct / total
+        if step % checkpoint.CHECKPOINT_EVERY_STEPS == 0:
+            checkpoint.save(job_id, model, optimizer, epoch, step, epoch * len(loader) + step, loader.dataset)
+    avg_loss = total_loss / max(batches, 1)
+    acc = correct / max(total, 1)
     return {"loss": avg_loss, "accuracy": acc}
 
 
@@ -120,6 +198,8 @@ def run_training(config: dict[str, Any], job_id: str):
         ddp_runner.run_distributed(job_id, config, world_size)
         return
 
+    if config.get("seed") is not None:
+        torch.manual_seed(config["seed"])
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     logger.info(f"Using device: {device}, world_size={world_size}")
 
@@ -127,16 +207,21 @@ def run_training(config: dict[str, Any], job_id: str):
     criterion = nn.CrossEntropyLoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=lr)
 
-    loader = get_dataloaders(dataset, batch_size, world_size, rank=0)
+    loader = get_dataloaders(dataset, batch_size, world_size, rank=0, seed=config.get("seed"))
     r = redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
+    start_epoch, batches_done, _ = checkpoint.restore(job_id, model, optimizer, device, loader.dataset)
 
-    for epoch in range(epochs):
+    for epoch in range(start_epoch, epochs):
+        if hasattr(loader.dataset, "set_epoch"):
+            loader.dataset.set_epoch(epoch)
         metrics = train_one_epoch(
-            model, loader, criterion, optimizer, device, epoch, job_id, r, world_size, 0
+            model, loader, criterion, optimizer, device, epoch, job_id, r, world_size, 0,
+            batches_done=batches_done if epoch == start_epoch else 0,
         )
         logger.info(f"Epoch {epoch + 1}/{epochs} - loss: {metrics['loss']:.4f} acc: {metrics['accuracy']:.4f}")
+        checkpoint.save(job_id, model, optimizer, epoch + 1, 0, (epoch + 1) * len(loader))
         if r:
-            publish_metrics(r, job_id, (epoch + 1) * len(loader), float(epoch + 1), metrics)
+            publish_metrics(r, job_id, (epoch + 1) * len(loader), float(epoch + 1), metrics, epoch_end=True)
 
     if r:
         r.close()
@@ -0,0 +1,338 @@
+"""
+Sharded on-disk dataset for data larger than RAM.
+
+A dataset is a directory of large shard files of pre-encoded samples plus
+an index:
+
+    index.json            {"format", "version", "total_samples", "shards": [{"file", "samples", "bytes"}]}
+    shard-00000.bin       records: <u32 body length> <i32 label, u16 h, u16 w, u16 c> <h*w*c uint8 HWC>
+    shard-00000.idx       little-endian u64 byte offset of every record
+
+ShardedIterableDataset streams shards with large sequential reads. Each
+epoch the shard order is permuted (seeded by seed + epoch) and dealt
+round-robin to DDP ranks, then to DataLoader workers, so every process
+reads disjoint shards. Every rank yields the same number of whole batches
+(DDP needs equal step counts), dropping the tail of larger ranks.
+
+Shuffling uses a bounded buffer of shuffle_buffer samples: a worker's
+stream is cut into consecutive windows of that size and each window is
+permuted with an RNG seeded by (seed, epoch, rank, worker, window). That
+keeps memory bounded and makes positions reproducible, so resuming
+mid-epoch (load_state_dict, from a training.checkpoint) seeks straight
+to the right window through the .idx offsets instead of re-reading the
+skipped data.
+
+Select it with TrainingConfig.dataset = "shards:/path/to/dataset".
+
+    python -m training.shards convert-cifar10 /data/cifar10-shards --shard-mb 64
+    python -m training.shards inspect /data/cifar10-shards
+"""
+
+import argparse
+import json
+import os
+import pickle
+import random
+import struct
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+SHARD_PREFIX = "shards:"
+FORMAT = "ml-train-shards"
+VERSION = 1
+_LENGTH = struct.Struct("<I")
+_HEADER = struct.Struct("<iHHH")
+DEFAULT_READ_SIZE = 8 * 1024 * 1024
+
+
+def is_sharded(dataset: str) -> bool:
+    return dataset.startswith(SHARD_PREFIX)
+
+
+def encode_sample(image: np.ndarray, label: int) -> bytes:
+    """Record body for one uint8 HWC image."""
+    if image.dtype != np.uint8 or image.ndim != 3:
+        raise ValueError(f"Expected a uint8 HWC array, got {image.dtype} with shape {image.shape}")
+    h, w, c = image.shape
+    return _HEADER.pack(int(label), h, w, c) + np.ascontiguousarray(image).tobytes()
+
+
+def decode_sample(body: bytes) -> tuple[np.ndarray, int]:
+    label, h, w, c = _HEADER.unpack_from(body)
+    image = np.frombuffer(body, dtype=np.uint8, count=h * w * c, offset=_HEADER.size).reshape(h, w, c)
+    return image, label
+
+
+class ShardWriter:
+    """Appends encoded samples to shard files of about shard_bytes each; close() writes the index."""
+
+    def __init__(self, root: str | Path, shard_bytes: int = 256 * 1024 * 1024) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_bytes = shard_bytes
+        self.shards: list[dict[str, Any]] = []
+        self._file = None
+        self._offsets: list[int] = []
+        self._size = 0
+        self._index: dict[str, Any] | None = None
+
+    def _open_next(self) -> None:
+        self._close_current()
+        name = f"shard-{len(self.shards):05d}.bin"
+        self._file = open(self.root / name, "wb", buffering=DEFAULT_READ_SIZE)
+        self._offsets = []
+        self._size = 0
+        self.shards.append({"file": name, "samples": 0, "bytes": 0})
+
+    def _close_current(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        np.asarray(self._offsets, dtype="<u8").tofile(self.root / self.shards[-1]["file"].replace(".bin", ".idx"))
+        self.shards[-1].update(samples=len(self._offsets), bytes=self._size)
+        self._file = None
+
+    def write(self, image: np.ndarray, label: int) -> None:
+        if self._file is None or self._size >= self.shard_bytes:
+            self._open_next()
+        body = encode_sample(image, label)
+        self._offsets.append(self._size)
+        self._file.write(_LENGTH.pack(len(body)))
+        self._file.write(body)
+        self._size += _LENGTH.size + len(body)
+
+    def close(self, meta: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Write the index; later calls (e.g. __exit__ after an explicit close) return it unchanged."""
+        if self._index is not None:
+            return self._index
+        self._close_current()
+        index = {
+            "format": FORMAT,
+            "version": VERSION,
+            "total_samples": sum(s["samples"] for s in self.shards),
+            "shards": self.shards,
+            "meta": meta or {},
+        }
+        tmp = self.root / "index.json.tmp"
+        tmp.write_text(json.dumps(index, indent=1))
+        os.replace(tmp, self.root / "index.json")
+        self._index = index
+        return index
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if exc[0] is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+
+
+def load_index(root: str | Path) -> dict[str, Any]:
+    index = json.loads((Path(root) / "index.json").read_text())
+    if index.get("format") != FORMAT or index.get("version", 0) > VERSION:
+        raise ValueError(f"{root} is not a supported shard dataset (format={index.get('format')}, version={index.get('version')})")
+    return index
+
+
+def plan_epoch(
+    shard_samples: list[int],
+    epoch: int,
+    seed: int,
+    world_size: int,
+    num_workers: int,
+    batch_size: int,
+) -> list[list[tuple[list[int], int]]]:
+    """
+    Deterministic epoch plan: plan[rank][worker] = (shard ids in read order,
+    samples to yield). Every rank gets the same number of whole batches.
+    """
+    order = list(range(len(shard_samples)))
+    random.Random(f"{seed}:{epoch}").shuffle(order)
+    if len(order) < world_size:
+        raise ValueError(f"{len(order)} shards cannot be split across {world_size} ranks")
+
+    plan = []
+    for rank in range(world_size):
+        rank_shards = order[rank::world_size]
+        plan.append([
+            (rank_shards[w::num_workers], sum(shard_samples[s] for s in rank_shards[w::num_workers]) // batch_size)
+            for w in range(num_workers)
+        ])
+    target = min(sum(batches for _, batches in workers) for workers in plan)
+    for workers in plan:
+        batches = [b for _, b in workers]
+        excess = sum(batches) - target
+        while excess > 0:
+            # Trim the worker with the most batches (lowest id on ties) so the plan is the same everywhere
+            w = max(range(len(batches)), key=lambda i: (batches[i], -i))
+            batches[w] -= 1
+            excess -= 1
+        workers[:] = [(shards, b * batch_size) for (shards, _), b in zip(workers, batches)]
+    return plan
+
+
+def batches_per_worker(worker_batches: list[int], batches_done: int) -> list[int]:
+    """
+    How many batches each worker had produced once the DataLoader yielded
+    batches_done batches (it takes them round-robin, skipping exhausted workers).
+    """
+    done = [0] * len(worker_batches)
+    remaining = batches_done
+    while remaining > 0:
+        progressed = False
+        for w, total in enumerate(worker_batches):
+            if remaining == 0:
+                break
+            if done[w] < total:
+                done[w] += 1
+                remaining -= 1
+                progressed = True
+        if not progressed:
+            break
+    return done
+
+
+class ShardedIterableDataset(IterableDataset):
+    """Streams a shard dataset for one DDP rank; see the module docstring."""
+
+    def __init__(
+        self,
+        root: str | Path,
+        transform: Callable | None = None,
+        rank: int = 0,
+        world_size: int = 1,
+        batch_size: int = 1,
+        shuffle_buffer: int = 8192,
+        seed: int = 0,
+        read_size: int = DEFAULT_READ_SIZE,
+        num_workers: int = 1,
+    ) -> None:
+        self.root = Path(root)
+        self.index = load_index(self.root)
+        self.shard_samples = [s["samples"] for s in self.index["shards"]]
+        self.transform = transform
+        self.rank = rank
+        self.world_size = world_size
+        self.batch_size = batch_size
+        self.shuffle_buffer = max(shuffle_buffer, 1)
+        self.seed = seed
+        self.read_size = read_size
+        self.num_workers = max(num_workers, 1)  # DataLoader workers; __len__ depends on the split
+        self.epoch = 0
+        self._resume_batches = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """Call before each epoch (like DistributedSampler.set_epoch)."""
+        if epoch != self.epoch:
+            self._resume_batches = 0
+        self.epoch = epoch
+
+    def state_dict(self, batches_done: int) -> dict[str, int]:
+        """Position to record after this rank consumed batches_done batches of the current epoch."""
+        return {"epoch": self.epoch, "batches_done": batches_done}
+
+    def load_state_dict(self, state: dict[str, int]) -> None:
+        """
+        Resume mid-epoch: the next iteration yields exactly the batches not yet
+        consumed (with several loader workers they may interleave differently).
+        """
+        self.epoch = state["epoch"]
+        self._resume_batches = state["batches_done"]
+
+    def _plan(self, num_workers: int) -> list[tuple[list[int], int]]:
+        return plan_epoch(
+            self.shard_samples, self.epoch, self.seed, self.world_size, num_workers, self.batch_size
+        )[self.rank]
+
+    def __len__(self) -> int:
+        """
+        Samples this rank yields per epoch (the same on every rank) with
+        num_workers loader workers: each worker yields whole batches, so more
+        workers can mean fewer batches.
+        """
+        return sum(quota for _, quota in self._plan(self.num_workers))
+
+    def __iter__(self) -> Iterator[tuple[Any, int]]:
+        info = get_worker_info()
+        worker, num_workers = (info.id, info.num_workers) if info else (0, 1)
+        plan = self._plan(num_workers)
+        shards, quota = plan[worker]
+        done = batches_per_worker([q // self.batch_size for _, q in plan], self._resume_batches)
+        skip = done[worker] * self.batch_size
+        for body in self._stream(shards, quota, skip, worker):
+            image, label = decode_sample(body)
+            yield (self.transform(image) if self.transform else torch.from_numpy(image.copy())), label
+
+    def _stream(self, shards: list[int], quota: int, skip: int, worker: int) -> Iterator[bytes]:
+        """Shuffled record bodies [skip, quota) of this worker's stream, one window at a time."""
+        window = self.shuffle_buffer
+        first_window = skip // window
+        reader = self._records(shards, start=first_window * window)
+        position = first_window * window
+        while position < quota:
+            size = min(window, quota - position)
+            buffer = [next(reader) for _ in range(size)]
+            rng = random.Random(f"{self.seed}:{self.epoch}:{self.rank}:{worker}:{position // window}")
+            rng.shuffle(buffer)
+            start = max(skip - position, 0)
+            yield from buffer[start:]
+            position += size
+
+    def _records(self, shards: list[int], start: int) -> Iterator[bytes]:
+        """Record bodies of the given shards in order, starting at sample `start`."""
+        for shard in shards:
+            count = self.shard_samples[shard]
+            if start >= count:
+                start -= count
+                continue
+            path = self.root / self.index["shards"][shard]["file"]
+            with open(path, "rb", buffering=self.read_size) as f:
+                if start:
+                    offsets = np.fromfile(path.with_suffix(".idx"), dtype="<u8")
+                    f.seek(int(offsets[start]))
+                for _ in range(count - start):
+                    (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+                    yield f.read(length)
+            start = 0
+
+
+def convert_cifar10(out: str | Path, shard_bytes: int) -> dict[str, Any]:
+    """Write the CIFAR-10 training split (from the dataset cache) as shards."""
+    from .dataset_cache import ensure_dataset
+
+    batches = ensure_dataset("cifar10") / "cifar-10-batches-py"
+    with ShardWriter(out, shard_bytes=shard_bytes) as writer:
+        for i in range(1, 6):
+            with open(batches / f"data_batch_{i}", "rb") as f:
+                batch = pickle.load(f, encoding="bytes")
+            images = batch[b"data"].reshape(-1, 3, 32, 32).transpose(0, 2, 3, 1)
+            for image, label in zip(images, batch[b"labels"]):
+                writer.write(image, label)
+        return writer.close(meta={"source": "cifar10", "split": "train", "num_classes": 10})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded dataset tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert-cifar10", help="Write CIFAR-10 train as shards")
+    convert.add_argument("out")
+    convert.add_argument("--shard-mb", type=int, default=64)
+    inspect = sub.add_parser("inspect", help="Print a dataset's index summary")
+    inspect.add_argument("root")
+    args = parser.parse_args()
+
+    if args.command == "convert-cifar10":
+        index = convert_cifar10(args.out, args.shard_mb * 1024 * 1024)
+    else:
+        index = load_index(args.root)
+    print(f"{index['total_samples']} samples in {len(index['shards'])} shards")
+
+
+if __name__ == "__main__":
+    main()